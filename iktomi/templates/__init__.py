@@ -41,6 +41,19 @@ class Template(object):
         resolved_name, engine = self.resolve(template_name)
         return engine.render(resolved_name, **vars)
 
+    def stream(self, template_name, **kw):
+        '''
+        Same as `render`, but returns an iterator of string chunks. Engines
+        without `stream` method render the whole template at once.
+        '''
+        logger.debug('Streaming template "%s"', template_name)
+        vars = self.globs.copy()
+        vars.update(kw)
+        resolved_name, engine = self.resolve(template_name)
+        if hasattr(engine, 'stream'):
+            return engine.stream(resolved_name, **vars)
+        return iter([engine.render(resolved_name, **vars)])
+
     def resolve(self, template_name):
         pattern = template_name
         if not os.path.splitext(template_name)[1]:
@@ -57,6 +70,43 @@ class Template(object):
                 'directories {!r}'.format(pattern, self.dirs))
 
 
+def buffered(chunks, buffer_size, encoding='utf-8'):
+    '''
+    Encodes string chunks and joins them to blocks of at least
+    `buffer_size` bytes (the last one may be shorter).
+    '''
+    block = []
+    size = 0
+    for chunk in chunks:
+        chunk = chunk.encode(encoding)
+        block.append(chunk)
+        size += len(chunk)
+        if size >= buffer_size:
+            yield b''.join(block)
+            block = []
+            size = 0
+    if block:
+        yield b''.join(block)
+
+
+def _in_state(env, state, chunks):
+    '''
+    Iterates over `chunks` with `env` in the `state` returned by
+    `env._snapshot()`: while the response is sent the routing frames are
+    already popped.
+    '''
+    chunks = iter(chunks)
+    while True:
+        previous = env._restore(state)
+        try:
+            chunk = next(chunks)
+        except StopIteration:
+            return
+        finally:
+            env._restore(previous)
+        yield chunk
+
+
 class BoundTemplate(object):
     '''
     Object used to bound a `Template` object to iktomi environment.
@@ -70,6 +120,9 @@ class BoundTemplate(object):
             env.template = BoundTemplate(env, template)
     '''
 
+    #: Size of blocks sent by streaming `render_to_response`
+    stream_buffer_size = 16 * 1024
+
     def __init__(self, env, template):
         self.template = template
         self.env = env
@@ -103,10 +156,38 @@ class BoundTemplate(object):
         return self.template.render(template_name,
                                     **self._vars(__data, **kw))
 
+    def stream(self, template_name, __data=None, **kw):
+        '''Given a template name and template data.
+        Returns an iterator of rendered string chunks. The template sees
+        `env` as it is at the moment of the call, even if it is iterated
+        later'''
+        chunks = self.template.stream(template_name,
+                                      **self._vars(__data, **kw))
+        if hasattr(self.env, '_snapshot'):
+            return _in_state(self.env, self.env._snapshot(), chunks)
+        return chunks
+
     def render_to_response(self, template_name, __data,
-                           content_type="text/html"):
+                           content_type="text/html", stream=False):
         '''Given a template name and template data.
-        Renders a template and returns `webob.Response` object'''
+        Renders a template and returns `webob.Response` object.
+
+        If `stream` is set, the template is rendered while the response is
+        sent, in blocks of `stream_buffer_size` bytes. Note that errors in
+        the template are raised after the response status is sent.
+
+        Returns 304 Not Modified response without rendering if the client
+        has the version set by `env.conditional.set` (see
+        `web.conditional`).'''
+        conditional = getattr(self.env, 'conditional', None)
+        if conditional is not None and conditional.not_modified:
+            return conditional.response()
+        if stream:
+            chunks = self.stream(template_name, __data)
+            return Response(app_iter=buffered(chunks,
+                                              self.stream_buffer_size),
+                            content_type=content_type,
+                            charset='utf-8')
         resp = self.render(template_name, __data)
         return Response(resp,
                         content_type=content_type)
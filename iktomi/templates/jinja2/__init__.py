@@ -36,3 +36,7 @@ class TemplateEngine(object):
     def render(self, template_name, **kw):
         'Interface method called from `Template.render`'
         return self.env.get_template(template_name).render(**kw)
+
+    def stream(self, template_name, **kw):
+        'Interface method called from `Template.stream`'
+        return self.env.get_template(template_name).generate(**kw)
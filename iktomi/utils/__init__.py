@@ -2,7 +2,8 @@
 import six
 
 from xml.sax import saxutils
-import weakref, re, sys
+import weakref, re, sys, threading
+from collections import OrderedDict
 
 from iktomi.utils.i18n import M_, N_ # deprecated, import from iktomi.utils.i18n
 
@@ -72,6 +73,42 @@ class cached_class_property(object):
         return result
 
 
+class LRUCache(object):
+    '''Thread-safe mapping keeping at most `maxsize` recently used items.'''
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data.pop(key)
+            except KeyError:
+                return default
+            # mark as recently used
+            self._data[key] = value
+            return value
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = value
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
 # http://www.w3.org/TR/REC-xml/#NT-Char
 # Char ::= #x9 | #xA | #xD | [#x20-#xD7FF] | [#xE000-#xFFFD] | 
 #          [#x10000- #x10FFFF]
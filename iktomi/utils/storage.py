@@ -45,6 +45,16 @@ class VersionedStorage(object):
     def _pop(self):
         self._storage = self._storage._parent_storage
 
+    def _snapshot(self):
+        '''Returns current state to be set back later by `_restore`'''
+        return self._storage
+
+    def _restore(self, state):
+        '''Sets the state returned by `_snapshot`, returns previous one'''
+        previous = self._storage
+        self._storage = state
+        return previous
+
     def __getattr__(self, name):
         frame = self._storage
         while frame:
@@ -70,6 +80,100 @@ class VersionedStorage(object):
         return self._storage.as_dict()
 
 
+_missing = object()
+
+
+class FlatVersionedStorage(object):
+    '''Alternative engine with the same interface as `VersionedStorage`.
+
+    Attributes set in pushed frames are kept in a single flat dict (the
+    instance dict), so they are found by regular attribute lookup in O(1).
+    Previous values of changed attributes are written to undo log, `_pop`
+    rolls back only the attributes set after corresponding `_push`.
+
+    Attributes not found in the flat dict are looked up in the root frame,
+    an instance of `cls`, so its methods, properties and storage
+    descriptors work the same way. Attributes set while no frame is pushed
+    are set to the root frame.
+
+    Unlike `VersionedStorage`, `_push` returns the storage itself.'''
+
+    __slots__ = ('__dict__', '_root', '_log', '_marks')
+
+    def __init__(self, cls=StorageFrame, *args, **kwargs):
+        kwargs['_root_storage'] = self
+        object.__setattr__(self, '_log', [])
+        object.__setattr__(self, '_marks', [])
+        object.__setattr__(self, '_root', cls(*args, **kwargs))
+
+    def _push(self, **kwargs):
+        self._marks.append(len(self._log))
+        for name, value in kwargs.items():
+            setattr(self, name, value)
+        return self
+
+    def _pop(self):
+        mark = self._marks.pop()
+        log = self._log
+        values = self.__dict__
+        while len(log) > mark:
+            name, value = log.pop()
+            if value is _missing:
+                del values[name]
+            else:
+                values[name] = value
+
+    def _snapshot(self):
+        '''Returns current state to be set back later by `_restore`'''
+        return (dict(self.__dict__), list(self._log), list(self._marks))
+
+    def _restore(self, state):
+        '''Sets the state returned by `_snapshot`, returns previous one'''
+        previous = (self.__dict__, self._log, self._marks)
+        values, log, marks = state
+        object.__setattr__(self, '__dict__', values)
+        object.__setattr__(self, '_log', log)
+        object.__setattr__(self, '_marks', marks)
+        return previous
+
+    def __getattr__(self, name):
+        try:
+            return getattr(self._root, name)
+        except AttributeError:
+            raise AttributeError("{} has no attribute {}".format(
+                                 self.__class__.__name__, name))
+
+    def __setattr__(self, name, value):
+        if not self._marks:
+            setattr(self._root, name, value)
+        else:
+            values = self.__dict__
+            self._log.append((name, values.get(name, _missing)))
+            values[name] = value
+
+    def __delattr__(self, name):
+        if not self._marks:
+            delattr(self._root, name)
+            return
+        # only attributes set in the current frame can be deleted
+        log = self._log
+        mark = self._marks[-1]
+        changes = [i for i in range(mark, len(log)) if log[i][0] == name]
+        if not changes:
+            raise AttributeError(name)
+        value = log[changes[0]][1]
+        for i in reversed(changes):
+            del log[i]
+        if value is _missing:
+            del self.__dict__[name]
+        else:
+            self.__dict__[name] = value
+
+    def as_dict(self):
+        '''Returns attributes of storage as dict'''
+        return dict(self._root.as_dict(), **self.__dict__)
+
+
 class storage_property_base(object):
 
     def __init__(self, method, name=None):
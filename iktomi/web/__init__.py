@@ -2,6 +2,8 @@ from webob import Request, Response
 from .core import *
 from .app import *
 from .filters import *
+from .cache import *
+from .compress import *
 from .reverse import *
 from .url import *
 from .testing import *
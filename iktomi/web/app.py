@@ -8,7 +8,7 @@ from iktomi.utils.storage import VersionedStorage, StorageFrame, storage_propert
 from webob.exc import HTTPException, HTTPInternalServerError, \
                       HTTPNotFound
 from webob import Request
-from .route_state import RouteState
+from .route_state import RouteState, valid_hosts, decode_host
 from .reverse import Reverse
 
 logger = logging.getLogger(__name__)
@@ -79,15 +79,81 @@ class Application(object):
     WSGI application made from `iktomi.web.WebHandler' instance::
 
         wsgi_app = Application(app, env_class=FrontEnvironment)
+
+    If `compile_routes` is set, routing structures of the handler tree are
+    precompiled once, so `web.cases` calls only the branches which static
+    path prefix (and subdomain for sibling `web.subdomain` branches) matches
+    the request instead of trying them one by one.
+    Note that the handlers are compiled in place.
+
+    Host header of each request is validated. Valid hosts are cached along
+    with their decoded domains, which are used by routing as well. If
+    `allowed_hosts` is set, requests with any other host name get 404
+    without further validation. Host names are compared case-insensitively
+    as they are sent by the client (idna-encoded), ports are ignored.
+    `allowed_hosts` may contain both unicode and idna-encoded names::
+
+        wsgi_app = Application(app, allowed_hosts=['example.com',
+                                                   'www.example.com'])
+
+    If `profiler` (`iktomi.web.profiling.Profiler` instance) is set, handlers
+    of the tree are instrumented in place and each request is profiled.
+
+    `storage_class` is used to create `env` and `data` objects. Set it to
+    `iktomi.utils.storage.FlatVersionedStorage` for deep handler trees,
+    it makes attribute lookup and rolling back the state on `web.cases`
+    branches cheaper.
     '''
 
     env_class = AppEnvironment
+    storage_class = VersionedStorage
+    compile_routes = False
+    allowed_hosts = None
+    profiler = None
 
-    def __init__(self, handler, env_class=None):
+    def __init__(self, handler, env_class=None, compile_routes=None,
+                 storage_class=None, allowed_hosts=None, profiler=None):
         self.handler = handler
         if env_class is not None:
             self.env_class = env_class
+        if storage_class is not None:
+            self.storage_class = storage_class
+        if compile_routes is not None:
+            self.compile_routes = compile_routes
+        if allowed_hosts is not None:
+            self.allowed_hosts = allowed_hosts
+        if self.allowed_hosts is not None:
+            # clients send punycode in Host header
+            self.allowed_hosts = frozenset(
+                    x.encode('idna').decode('ascii').lower()
+                    for x in self.allowed_hosts)
+        if profiler is not None:
+            self.profiler = profiler
         self.root = Reverse.from_handler(handler)
+        if self.compile_routes:
+            handler._compile()
+        if self.profiler is not None:
+            self.profiler.instrument(handler)
+            self.storage_class = self.profiler.storage_class(
+                                                    self.storage_class)
+
+    def is_host_allowed(self, host):
+        '''
+        Checks Host header value against `allowed_hosts` and validates it.
+        Valid hosts are cached.
+        '''
+        if self.allowed_hosts is not None and \
+                host.split(':', 1)[0].lower() not in self.allowed_hosts:
+            return False
+        if host in valid_hosts:
+            return True
+        if not is_host_valid(host):
+            return False
+        try:
+            valid_hosts[host] = decode_host(host)
+        except UnicodeError:
+            return False
+        return True
 
     def handle_error(self, env):
         '''
@@ -123,14 +189,18 @@ class Application(object):
         Creates webob and iktomi wrappers and calls `handle` method.
         '''
         # validating Host header to prevent problems with url parsing
-        if not is_host_valid(environ['HTTP_HOST']):
+        if not self.is_host_allowed(environ['HTTP_HOST']):
             logger.warning('Unusual header "Host: {}", return HTTPNotFound'\
                            .format(environ['HTTP_HOST']))
             return HTTPNotFound()(environ, start_response)
         request = Request(environ, charset='utf-8')
-        env = VersionedStorage(self.env_class, request=request, root=self.root)
-        data = VersionedStorage()
-        response = self.handle(env, data)
+        env = self.storage_class(self.env_class, request=request,
+                                 root=self.root)
+        data = self.storage_class()
+        if self.profiler is None:
+            response = self.handle(env, data)
+        else:
+            response = self.profiler.handle(self, env, data)
         try:
             result = response(environ, start_response)
         except Exception:
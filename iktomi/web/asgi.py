@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+'''
+ASGI interface for iktomi handler trees (python 3.5+, the module can not be
+imported on python 2).
+
+Routing in iktomi is a synchronous call chain: `web.cases` pushes and pops
+`env` and `data` frames around each branch and treats `None` result as
+"try the next branch". So the handler tree is called in a bounded thread
+pool, one thread per request, like a regular WSGI worker does it.
+'''
+
+__all__ = ['AsgiApplication']
+
+import io
+import sys
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from .app import Application
+
+
+def _environ(scope, body):
+    server_name, server_port = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8')
+                                                .decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server_name,
+        'SERVER_PORT': str(server_port),
+        'SERVER_PROTOCOL': 'HTTP/' + scope.get('http_version', '1.1'),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_TYPE' or name == 'CONTENT_LENGTH':
+            key = name
+        else:
+            key = 'HTTP_' + name
+        if key in environ:
+            value = environ[key] + ',' + value
+        environ[key] = value
+    if 'CONTENT_LENGTH' not in environ:
+        # the body is read already, chunked requests have no length
+        environ['CONTENT_LENGTH'] = str(len(body))
+    if 'HTTP_HOST' not in environ:
+        port = environ['SERVER_PORT']
+        environ['HTTP_HOST'] = server_name if port in ('80', '443') \
+                               else server_name + ':' + port
+    return environ
+
+
+class AsgiApplication(Application):
+    '''
+    ASGI application made from `iktomi.web.WebHandler` instance::
+
+        asgi_app = AsgiApplication(app, env_class=FrontEnvironment,
+                                   max_workers=64)
+
+    Accepts the same arguments as `Application`. Handlers are called in a
+    thread pool of `max_workers` threads, so as many requests are handled
+    concurrently and the event loop of the server is never blocked. Set it
+    to the expected number of concurrent slow requests.
+    '''
+
+    max_workers = 32
+
+    def __init__(self, handler, max_workers=None, **kwargs):
+        Application.__init__(self, handler, **kwargs)
+        if max_workers is not None:
+            self.max_workers = max_workers
+        self._executor = None
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.max_workers)
+        return self._executor
+
+    def shutdown(self):
+        '''Stops the thread pool, is called on ASGI lifespan shutdown'''
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    async def __call__(self, scope, receive, send):
+        '''ASGI interface method'''
+        if scope['type'] == 'http':
+            await self.handle_http(scope, receive, send)
+        elif scope['type'] == 'lifespan':
+            await self.handle_lifespan(scope, receive, send)
+        else:
+            raise NotImplementedError(
+                    'Unsupported ASGI scope type {!r}'.format(scope['type']))
+
+    async def handle_lifespan(self, scope, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def handle_http(self, scope, receive, send):
+        '''
+        Reads the request body, calls WSGI interface of the application
+        in the thread pool and sends the response.
+        '''
+        body = []
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            body.append(message.get('body', b''))
+            if not message.get('more_body'):
+                break
+        # get_running_loop is not available before python 3.7
+        loop = asyncio.get_event_loop()
+        environ = _environ(scope, b''.join(body))
+        status_and_headers = []
+
+        def start_response(status, headers, exc_info=None):
+            status_and_headers[:] = [status, headers]
+
+        def call():
+            result = Application.__call__(self, environ, start_response)
+            if isinstance(result, (list, tuple)):
+                return result, None
+            # streamed responses are read chunk by chunk in the pool
+            return None, result
+
+        chunks, result = await loop.run_in_executor(self.executor, call)
+        # webob responses call start_response before returning body
+        status, headers = status_and_headers
+        await send({
+            'type': 'http.response.start',
+            'status': int(status.split(' ', 1)[0]),
+            'headers': [(name.lower().encode('latin-1'),
+                         value.encode('latin-1'))
+                        for name, value in headers],
+        })
+        if chunks is not None:
+            for chunk in chunks:
+                if chunk:
+                    await send({'type': 'http.response.body', 'body': chunk,
+                                'more_body': True})
+        else:
+            iterator = iter(result)
+            try:
+                while True:
+                    chunk = await loop.run_in_executor(
+                            self.executor, next, iterator, None)
+                    if chunk is None:
+                        break
+                    if chunk:
+                        await send({'type': 'http.response.body',
+                                    'body': chunk, 'more_body': True})
+            finally:
+                if hasattr(result, 'close'):
+                    await loop.run_in_executor(self.executor, result.close)
+        await send({'type': 'http.response.body', 'body': b''})
@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+
+'''
+Caching of responses: server-side in `iktomi.storage.Storage` and
+conditional requests.
+'''
+
+__all__ = ['cache_response', 'conditional', 'Conditional']
+
+import time
+import hashlib
+import threading
+import datetime
+import calendar
+from webob import Response
+from webob.datetime_utils import serialize_date
+from .core import WebHandler
+from .static import _etag_matches, _parse_timestamp
+
+
+class KeyLocks(object):
+    '''
+    Locks by key, a lock exists only while somebody holds or waits for it.
+    '''
+
+    def __init__(self):
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._locks.get(key)
+            if entry is None:
+                entry = self._locks[key] = [threading.Lock(), 0]
+            entry[1] += 1
+            return entry[0]
+
+    def _release(self, key):
+        with self._lock:
+            entry = self._locks[key]
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[key]
+
+    def acquire(self, key, blocking=True):
+        '''Returns `True` if the lock is acquired'''
+        lock = self._get(key)
+        if lock.acquire(blocking):
+            return True
+        self._release(key)
+        return False
+
+    def release(self, key):
+        self._locks[key][0].release()
+        self._release(key)
+
+
+class cache_response(WebHandler):
+    '''
+    Caches responses of the handlers chained after it in
+    `iktomi.storage.Storage`::
+
+        web.match('/news/<int:id>', 'item') | \\
+            web.cache_response(storage, ttl=60, stale_ttl=600,
+                               data=['id'], query=['page'],
+                               headers=['Accept-Language']) | \\
+            news_item
+
+    Cache key is built from `env.current_location`, given attributes of
+    `data`, query params and request headers. Only GET and HEAD requests are
+    cached, responses are stored if their status is in `statuses` and
+    they do not set cookies.
+
+    A response is fresh for `ttl` seconds. During next `stale_ttl` seconds
+    one request regenerates it while concurrent requests get the stale
+    one. If there is no response in cache, only one request per key
+    regenerates it and concurrent requests wait for the result. Note that
+    locks are held per process.
+    '''
+
+    key_prefix = 'iktomi.cache_response:'
+
+    def __init__(self, storage, ttl=60, stale_ttl=0, data=(), query=(),
+                 headers=(), statuses=(200,)):
+        self.storage = storage
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.data = tuple(data)
+        self.query = tuple(query)
+        self.headers = tuple(headers)
+        self.statuses = frozenset(statuses)
+        self.locks = KeyLocks()
+
+    def cache_key(self, env, data):
+        request = env.request
+        parts = [env.current_location]
+        parts.extend(repr(getattr(data, name, None)) for name in self.data)
+        parts.extend(repr(request.GET.getall(name)) for name in self.query)
+        parts.extend(repr(request.headers.get(name))
+                     for name in self.headers)
+        key = u'\0'.join(parts).encode('utf-8')
+        # memcached does not allow long keys and whitespace
+        return self.key_prefix + hashlib.md5(key).hexdigest()
+
+    def _load(self, key):
+        value = self.storage.get(key)
+        if value is None:
+            return None, None
+        created, status, headerlist, body = value
+        response = Response(body=body, status=status,
+                            headerlist=list(headerlist))
+        return response, time.time() - created
+
+    def _regenerate(self, key, env, data):
+        response = self.next_handler(env, data)
+        if isinstance(response, Response) and \
+                response.status_int in self.statuses and \
+                'Set-Cookie' not in response.headers:
+            value = (time.time(), response.status, response.headerlist,
+                     response.body)
+            self.storage.set(key, value, self.ttl + self.stale_ttl)
+        return response
+
+    def cache_response(self, env, data):
+        if env.request.method not in ('GET', 'HEAD'):
+            return self.next_handler(env, data)
+        key = self.cache_key(env, data)
+        response, age = self._load(key)
+        if response is not None:
+            if age < self.ttl:
+                return response
+            if age < self.ttl + self.stale_ttl:
+                if not self.locks.acquire(key, blocking=False):
+                    # somebody regenerates it already
+                    return response
+                try:
+                    return self._regenerate(key, env, data)
+                finally:
+                    self.locks.release(key)
+        self.locks.acquire(key)
+        try:
+            # it could be regenerated while we were waiting for the lock
+            response, age = self._load(key)
+            if response is not None and age < self.ttl:
+                return response
+            return self._regenerate(key, env, data)
+        finally:
+            self.locks.release(key)
+    __call__ = cache_response
+
+    def _route_prefix(self):
+        return self._next_route_prefix()
+
+    def __repr__(self):
+        return '{}(ttl={!r}, stale_ttl={!r})'.format(
+                self.__class__.__name__, self.ttl, self.stale_ttl)
+
+
+class Conditional(object):
+    '''
+    Version of the response to a conditional request, available as
+    `env.conditional` in handlers chained after `web.conditional`.
+    '''
+
+    def __init__(self, request):
+        self.request = request
+        self.etag = None
+        self.last_modified = None
+
+    def set(self, etag=None, last_modified=None):
+        '''
+        Sets the version of the response: a string `etag` and/or
+        `last_modified` timestamp or datetime. Returns `True` if the client
+        has this version already.
+        '''
+        if etag is not None:
+            etag = str(etag)
+            if not etag.startswith('"') and not etag.startswith('W/'):
+                etag = '"{}"'.format(etag)
+            self.etag = etag
+        if last_modified is not None:
+            if isinstance(last_modified, datetime.datetime):
+                last_modified = calendar.timegm(last_modified.utctimetuple())
+            self.last_modified = int(last_modified)
+        return self.not_modified
+
+    @property
+    def not_modified(self):
+        environ = self.request.environ
+        if environ['REQUEST_METHOD'] not in ('GET', 'HEAD'):
+            return False
+        if_none_match = environ.get('HTTP_IF_NONE_MATCH')
+        if if_none_match is not None:
+            if self.etag is None:
+                return False
+            etag = self.etag[2:] if self.etag.startswith('W/') else self.etag
+            return _etag_matches(if_none_match, etag)
+        since = _parse_timestamp(environ.get('HTTP_IF_MODIFIED_SINCE'))
+        return since is not None and self.last_modified is not None and \
+                self.last_modified <= since
+
+    def apply(self, response):
+        '''Sets ETag and Last-Modified headers of the response'''
+        if self.etag is not None:
+            response.headers['ETag'] = self.etag
+        if self.last_modified is not None:
+            response.headers['Last-Modified'] = \
+                    serialize_date(self.last_modified)
+        return response
+
+    def response(self):
+        '''Returns 304 Not Modified response'''
+        return self.apply(Response(status=304))
+
+
+class conditional(WebHandler):
+    '''
+    Answers conditional GET and HEAD requests (`If-None-Match`,
+    `If-Modified-Since`) with 304 Not Modified.
+
+    The version of the response can be computed by cheap `etag` and
+    `last_modified` callables accepting `env` and `data`. Then the rest of
+    the chain is not called at all if the client has the current version::
+
+        web.match('/news/<int:id>', 'item') | \\
+            web.conditional(etag=lambda env, data: data.id) | \\
+            news_item
+
+    A handler can set it with `env.conditional.set(...)` as well, then
+    `BoundTemplate.render_to_response` returns 304 without rendering::
+
+        def news_item(env, data):
+            item = env.db.query(News).get(data.id)
+            env.conditional.set(last_modified=item.updated)
+            return env.template.render_to_response('item', {'item': item})
+
+    Otherwise ETag is a hash of the response body if `hash_body` is set.
+    Streaming responses are not hashed.
+    '''
+
+    def __init__(self, etag=None, last_modified=None, hash_body=True):
+        self.etag = etag
+        self.last_modified = last_modified
+        self.hash_body = hash_body
+
+    def conditional(self, env, data):
+        state = env.conditional = Conditional(env.request)
+        if self.etag is not None or self.last_modified is not None:
+            state.set(
+                etag=self.etag and self.etag(env, data),
+                last_modified=self.last_modified and
+                        self.last_modified(env, data))
+            if state.not_modified:
+                return state.response()
+        response = self.next_handler(env, data)
+        # WSGI applications like `StaticFileApp` handle conditional
+        # requests themselves
+        if not isinstance(response, Response) or \
+                response.status_int != 200 or \
+                env.request.method not in ('GET', 'HEAD'):
+            return response
+        if state.etag is None:
+            if 'ETag' in response.headers:
+                state.etag = response.headers['ETag']
+            elif self.hash_body and isinstance(response.app_iter, list):
+                state.set(etag=hashlib.md5(response.body).hexdigest())
+        state.apply(response)
+        if state.not_modified:
+            return state.response()
+        return response
+    __call__ = conditional
+
+    def _route_prefix(self):
+        return self._next_route_prefix()
+
+    def __repr__(self):
+        return '{}()'.format(self.__class__.__name__)
@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+'''
+Compression of responses, used by `web.compress`.
+'''
+
+__all__ = ['compress']
+
+import zlib
+from webob import Response
+from iktomi.utils import LRUCache
+from .core import WebHandler
+from .static import _accepted_encodings
+
+try:
+    import brotli
+except ImportError: # pragma: no cover
+    brotli = None
+
+
+class GzipCompressor(object):
+
+    def __init__(self, level):
+        # wbits + 16 writes gzip header and trailer
+        self._obj = zlib.compressobj(level, zlib.DEFLATED,
+                                     zlib.MAX_WBITS | 16)
+
+    def compress(self, chunk):
+        return self._obj.compress(chunk)
+
+    def flush(self):
+        return self._obj.flush()
+
+
+class BrotliCompressor(object):
+
+    def __init__(self, level):
+        # brotli quality is 0..11, gzip level is 1..9
+        self._obj = brotli.Compressor(quality=min(level + 2, 11))
+
+    def compress(self, chunk):
+        return self._obj.process(chunk)
+
+    def flush(self):
+        return self._obj.finish()
+
+
+def _encoded_etag(etag, encoding):
+    # strong ETag of compressed body differs from the original one;
+    # '+' separator does not clash with '-gzip' of precompressed static files
+    if etag.endswith('"'):
+        return etag[:-1] + '+' + encoding + '"'
+    return etag
+
+
+def _strip_encodings(header, encodings):
+    tags = []
+    for tag in header.split(','):
+        tag = tag.strip()
+        for encoding in encodings:
+            suffix = '+' + encoding + '"'
+            if tag.endswith(suffix):
+                tag = tag[:-len(suffix)] + '"'
+                break
+        tags.append(tag)
+    return ', '.join(tags)
+
+
+class compress(WebHandler):
+    '''
+    Compresses responses of the rest of the chain with brotli (if `brotli`
+    package is installed) or gzip, whichever the client accepts::
+
+        web.compress(min_size=1024) | web.cases(...)
+
+    Only responses of `types` content types with known `Content-Length` of
+    at least `min_size` bytes or of unknown length are compressed. Streaming
+    responses are compressed chunk by chunk.
+
+    Compressed bodies of cacheable responses (having ETag and no
+    `private` or `no-store` in Cache-Control) up to `cache_max_size` bytes
+    are kept in memory, at most `cache_size` of them.
+    '''
+
+    types = ('text/', 'application/json', 'application/javascript',
+             'application/xml', 'image/svg+xml')
+
+    def __init__(self, min_size=1024, level=6, types=None,
+                 cache_size=100, cache_max_size=1024 * 1024):
+        self.min_size = min_size
+        self.level = level
+        if types is not None:
+            self.types = tuple(types)
+        self.cache_max_size = cache_max_size
+        self.cache = LRUCache(cache_size) if cache_size else None
+        self.compressors = [('gzip', GzipCompressor)]
+        if brotli is not None:
+            self.compressors.insert(0, ('br', BrotliCompressor))
+
+    def _is_compressible(self, env, response):
+        if env.request.method == 'HEAD' or \
+                response.status_int not in (200, 201, 202, 203) or \
+                'Content-Encoding' in response.headers:
+            return False
+        content_type = response.content_type or ''
+        if not content_type.startswith(self.types):
+            return False
+        if isinstance(response.app_iter, list):
+            return len(response.body) >= self.min_size
+        length = response.content_length
+        return length is None or length >= self.min_size
+
+    def _choose(self, env):
+        accepted = _accepted_encodings(
+                env.request.environ.get('HTTP_ACCEPT_ENCODING', ''))
+        for encoding, compressor in self.compressors:
+            if encoding in accepted:
+                return encoding, compressor
+        return None, None
+
+    def _cache_key(self, env, response, encoding):
+        if self.cache is None or response.etag is None:
+            return None
+        cache_control = response.cache_control
+        if cache_control.private or cache_control.no_store:
+            return None
+        return (env.request.path_qs, response.headers['ETag'], encoding)
+
+    def _stream(self, app_iter, compressor, cache_key):
+        cached = [] if cache_key is not None else None
+        size = 0
+        try:
+            for chunk in app_iter:
+                block = compressor.compress(chunk)
+                if block:
+                    if cached is not None:
+                        size += len(block)
+                        cached.append(block)
+                    yield block
+            block = compressor.flush()
+            if cached is not None:
+                cached.append(block)
+                if size + len(block) <= self.cache_max_size:
+                    self.cache[cache_key] = b''.join(cached)
+            yield block
+        finally:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
+
+    def compress(self, env, data):
+        environ = env.request.environ
+        if_none_match = environ.get('HTTP_IF_NONE_MATCH')
+        if if_none_match:
+            # conditional handlers see ETags of uncompressed responses
+            environ['HTTP_IF_NONE_MATCH'] = _strip_encodings(
+                    if_none_match, [x for x, _ in self.compressors])
+        try:
+            response = self.next_handler(env, data)
+        finally:
+            if if_none_match:
+                environ['HTTP_IF_NONE_MATCH'] = if_none_match
+        if not isinstance(response, Response):
+            # None or WSGI application like `StaticFileApp`
+            return response
+        encoding, compressor = self._choose(env)
+        if response.status_int == 304:
+            etag = response.headers.get('ETag')
+            if encoding is not None and etag is not None and \
+                    if_none_match and \
+                    _encoded_etag(etag, encoding) in if_none_match:
+                response.headers['ETag'] = _encoded_etag(etag, encoding)
+            return response
+        if not self._is_compressible(env, response):
+            return response
+        response.vary = tuple(response.vary or ()) + ('Accept-Encoding',)
+        if encoding is None:
+            return response
+        cache_key = self._cache_key(env, response, encoding)
+        if 'ETag' in response.headers:
+            response.headers['ETag'] = _encoded_etag(
+                    response.headers['ETag'], encoding)
+        response.content_encoding = encoding
+        cached = self.cache.get(cache_key) if cache_key else None
+        if cached is not None:
+            response.app_iter = [cached]
+            response.content_length = len(cached)
+            return response
+        app_iter = self._stream(response.app_iter, compressor(self.level),
+                                cache_key)
+        if isinstance(response.app_iter, list):
+            response.body = b''.join(app_iter)
+        else:
+            response.content_length = None
+            response.app_iter = app_iter
+        return response
+    __call__ = compress
+
+    def _route_prefix(self):
+        return self._next_route_prefix()
+
+    def __repr__(self):
+        return '{}(min_size={!r})'.format(self.__class__.__name__,
+                                          self.min_size)
@@ -2,20 +2,28 @@
 
 __all__ = ['WebHandler', 'cases', 'request_filter']
 
+import os
 import logging
 import functools
 
 from copy import copy
 from webob import Response
+from .router import CasesRouter, BranchStats
 
 logger = logging.getLogger(__name__)
 
 
 def is_chainable(handler):
     while isinstance(handler, WebHandler):
-        if not hasattr(handler, '_next_handler'):
+        attrs = handler.__dict__
+        if '_pending_next_handler' in attrs:
+            # the last chained handler is the end of the chain,
+            # do not resolve the chain to check it
+            handler = attrs['_pending_next_handler'][1][-1]
+        elif '_next_handler' in attrs:
+            handler = attrs['_next_handler']
+        else:
             return True
-        handler = handler._next_handler
     return False
 
 def respond(response):
@@ -23,6 +31,58 @@ def respond(response):
         return response
     return response_wrapper
 
+def chain_handler(handler, chained):
+    if handler is None:
+        handler, chained = chained[0], chained[1:]
+    if chained:
+        handler = handler._chain(chained)
+    return handler
+
+def chain_handlers(handlers, chained):
+    return [(handler._chain(chained)
+                 if is_chainable(handler)
+                 else handler)
+            for handler in handlers]
+
+
+class deferred_chain(object):
+    '''
+    Attribute holding handlers chained lazily.
+
+    Chaining does not copy handlers nested into the chain, it only stores
+    (base value, chained handlers) pair into `_pending_<name>` attribute
+    sharing the unchanged base value. The value is built by `chain` function
+    on first access and is stored in instance dict, so the descriptor is not
+    called anymore.
+    '''
+
+    def __init__(self, name, chain):
+        self.name = name
+        self.pending_name = '_pending' + name
+        self.chain = chain
+
+    def __get__(self, inst, cls):
+        if inst is None:
+            return self
+        pending = inst.__dict__.get(self.pending_name)
+        if pending is None:
+            raise AttributeError(self.name)
+        value = self.chain(*pending)
+        # set the value before removing pending chain to be thread-safe
+        inst.__dict__[self.name] = value
+        inst.__dict__.pop(self.pending_name, None)
+        return value
+
+    def defer(self, inst, handlers):
+        '''Chains a tuple of `handlers` to the value of `inst` copy'''
+        if self.pending_name in inst.__dict__:
+            value, chained = inst.__dict__[self.pending_name]
+        else:
+            value, chained = inst.__dict__.get(self.name), ()
+        inst.__dict__.pop(self.name, None)
+        inst.__dict__[self.pending_name] = (value, chained + handlers)
+
+
 def prepare_handler(handler):
     if isinstance(handler, Response):
         return respond(handler)
@@ -35,23 +95,29 @@ def prepare_handler(handler):
 class WebHandler(object):
     '''Base class for all request handlers.'''
 
+    # chained handlers are copied lazily on first access
+    _next_handler = deferred_chain('_next_handler', chain_handler)
+
     def __or__(self, next_handler):
         '''
         Supports chaining handler after itself::
 
             WebHandlerSubclass() | another_handler
+
+        Only the handler itself is copied. Handlers already chained after it
+        are shared with the original chain and are copied on first access
+        to `next_handler`, so long chains and chaining after big
+        `cases(..)` handlers are cheap.
         '''
-        # XXX in some cases copy count can be big
-        #     for example, chaining something after a huge cases(..) handler
-        #     causes a copy of each single nested handler.
-        #     Sure, is bad idea to chain anything after big cases(..) anyway.
-        h = self.copy()
+        return self._chain((prepare_handler(next_handler),))
 
-        next_handler = prepare_handler(next_handler)
-        if hasattr(self, '_next_handler'):
-            h._next_handler = h._next_handler | next_handler
-        else:
-            h._next_handler = next_handler
+    def _chain(self, handlers):
+        # chains a tuple of prepared handlers at once
+        if not is_chainable(self):
+            raise TypeError('Can not chain {!r} after {!r}, the chain is '
+                            'finished by a function'.format(handlers, self))
+        h = self.copy()
+        WebHandler._next_handler.defer(h, handlers)
         return h
 
     def _locations(self):
@@ -61,6 +127,33 @@ class WebHandler(object):
         # we are last in chain
         return {}
 
+    def _route_prefix(self):
+        '''
+        Returns urlencoded static prefix of the path (relative to the current
+        route state), that is required for the request to be accepted by the
+        chain. An empty string means there is no known restriction.
+
+        Used by compiled routing, see `_compile`.
+        '''
+        return ''
+
+    def _next_route_prefix(self):
+        # for handlers that do not touch the path and do not stop routing
+        # by themselves (guards like namespace or subdomain)
+        next_handler = self.next_handler
+        if isinstance(next_handler, WebHandler):
+            return next_handler._route_prefix()
+        return ''
+
+    def _compile(self):
+        '''
+        Precompiles routing structures for all nested handlers.
+        Called once by `Application` if `compile_routes` is enabled.
+        '''
+        next_handler = self.next_handler
+        if isinstance(next_handler, WebHandler):
+            next_handler._compile()
+
     def __repr__(self):
         return '{}()'.format(self.__class__.__name__)
 
@@ -106,27 +199,62 @@ class cases(WebHandler):
             web.match('/', 'index') | index,
             web.match('/contacts', 'contacts') | contacts,
             web.match('/about', 'about') | about,
-        )'''
-
-    def __init__(self, *handlers):
+        )
+
+    With `adaptive=True` hits and misses of the branches are counted
+    (see `stats`) and runs of static `web.match` branches, which order does
+    not matter, are periodically reordered to try the most hit ones first.
+    Adaptive mode is not used when routes are compiled, compiled routing
+    finds static branches by the path directly.'''
+
+    # set by _compile
+    _router = None
+    adaptive = False
+    # created on first call in adaptive mode
+    _stats = None
+
+    # chained handlers are copied lazily on first access
+    handlers = deferred_chain('handlers', chain_handlers)
+
+    def __init__(self, *handlers, **kwargs):
+        adaptive = kwargs.pop('adaptive', None)
+        if kwargs:
+            raise TypeError('Unexpected keyword arguments: {}'.format(
+                            ', '.join(kwargs)))
+        if adaptive is not None:
+            self.adaptive = adaptive
         self.handlers = [prepare_handler(x) for x in handlers]
 
-    def __or__(self, next_handler):
+    def _chain(self, handlers):
         #cases needs to set next handler for each handler it keeps
         h = self.copy()
-        h.handlers = [(handler | next_handler
-                            if is_chainable(handler) 
-                            else handler)
-                      for handler in self.handlers]
+        cases.handlers.defer(h, handlers)
+        h._router = None
+        h._stats = None
         return h
 
+    @property
+    def stats(self):
+        '''
+        `iktomi.web.router.BranchStats` with hit and miss counters of
+        the branches in adaptive mode or `None`.
+        '''
+        if self._stats is None and self.adaptive:
+            self._stats = BranchStats(self.handlers)
+        return self._stats
+
     def cases(self, env, data):
         '''Calls each nested handler until one of them returns nonzero result.
 
         If any handler returns `None`, it is interpreted as 
         "request does not match, the handler has nothing to do with it and 
         `web.cases` should try to call the next handler".'''
-        for handler in self.handlers:
+        handlers = self.handlers
+        if self._router is not None:
+            handlers = self._router.route(env)
+        elif self.adaptive:
+            return self._adaptive_cases(env, data)
+        for handler in handlers:
             env._push()
             data._push()
             try:
@@ -139,6 +267,21 @@ class cases(WebHandler):
     # for readable tracebacks
     __call__ = cases
 
+    def _adaptive_cases(self, env, data):
+        stats = self.stats
+        for index, handler in stats.tried():
+            env._push()
+            data._push()
+            try:
+                result = handler(env, data)
+            finally:
+                env._pop()
+                data._pop()
+            if result is not None:
+                stats.hits[index] += 1
+                return result
+            stats.misses[index] += 1
+
     def _locations(self):
         locations = {}
         for handler in self.handlers:
@@ -151,6 +294,27 @@ class cases(WebHandler):
                     locations[k] = v
         return locations
 
+    def _route_prefix(self):
+        prefixes = [self._branch_route_prefix(h) for h in self.handlers]
+        if not prefixes:
+            return ''
+        # any matched path starts with a prefix of one of the branches
+        return os.path.commonprefix(prefixes)
+
+    @staticmethod
+    def _branch_route_prefix(handler):
+        if isinstance(handler, WebHandler):
+            return handler._route_prefix()
+        return ''
+
+    def _compile(self):
+        for handler in self.handlers:
+            if isinstance(handler, WebHandler):
+                handler._compile()
+        prefixes = [self._branch_route_prefix(h) for h in self.handlers]
+        router = CasesRouter(self.handlers, prefixes)
+        self._router = None if router.is_empty else router
+
     def __repr__(self):
         return '{}({})'.format(self.__class__.__name__,
                                ', '.join(repr(h) for h in self.handlers))
@@ -9,11 +9,12 @@ import os
 from os import path
 from six.moves.urllib.parse import unquote
 from webob.exc import HTTPMethodNotAllowed, HTTPNotFound
-from webob.static import FileApp
 from .core import WebHandler, cases
 from . import Response
 from .url_templates import UrlTemplate
 from .reverse import Location
+from .router import _handler_type
+from .static import StatIndex, StaticFileApp, StaticManifest
 from iktomi.utils.deprecation import deprecated
 
 
@@ -55,18 +56,33 @@ class match(WebHandler):
 
     def match(self, env, data):
         matched, kwargs = self.builder.match(env._route_state.path, env=env)
+        return self._handle_matched(env, data, matched, kwargs)
+    __call__ = match # for beautiful tracebacks
+
+    def _call_prematched(self, matched, groups, env, data):
+        # called by compiled routing, which has already matched the path
+        # against the pattern joined with patterns of sibling handlers
+        matched, kwargs = self.builder._convert(matched, groups, env=env)
+        return self._handle_matched(env, data, matched, kwargs)
+
+    def _handle_matched(self, env, data, matched, kwargs):
         if matched is not None:
             env.current_url_name = self.url_name
             update_data(data, kwargs)
             return self.next_handler(env, data)
         return None
-    __call__ = match # for beautiful tracebacks
 
     def _locations(self):
         location = Location(self.builder,
                             fragment_builder=self.fragment_builder)
         return {self.url_name: (location, {})}
 
+    def _route_prefix(self):
+        if _handler_type(self) is not match:
+            # subclasses may override matching, the prefix is unknown
+            return ''
+        return self.builder.static_prefix
+
     def __repr__(self):
         return '{}({!r}, {!r})'.format(self.__class__.__name__,
                                        self.url, self.url_name)
@@ -116,6 +132,17 @@ class prefix(WebHandler):
             location.builders.insert(0, self.builder)
         return locations
 
+    def _route_prefix(self):
+        if _handler_type(self) is not prefix:
+            # subclasses may override matching, the prefix is unknown
+            return ''
+        result = self.builder.static_prefix
+        if not self.builder._url_params:
+            # the whole prefix is static, so we know where the rest of the
+            # path starts
+            result += self._next_route_prefix()
+        return result
+
     def __repr__(self):
         return '{}({!r})'.format(self.__class__.__name__, self.url)
 
@@ -139,6 +166,9 @@ class namespace(WebHandler):
         return self.next_handler(env, data)
     __call__ = namespace
 
+    def _route_prefix(self):
+        return self._next_route_prefix()
+
     def _locations(self):
         locations = WebHandler._locations(self)
         all_locations = [x[0] for x in locations.values()]
@@ -209,6 +239,13 @@ class method(WebHandler):
         return None
     __call__ = method
 
+    def _route_prefix(self):
+        if self.strict:
+            # raises an error instead of continuing routing,
+            # so it must be called for any path
+            return ''
+        return self._next_route_prefix()
+
     def __repr__(self):
         return 'method({})'.format(', '.join(repr(n) for n in self._names))
 
@@ -219,19 +256,46 @@ class by_method(cases):
 
         by_method({'GET': get_item_handler,
                    'POST': save_item_handler})
+
+    The branch is chosen by request method with a dict lookup, `HEAD`
+    requests are handled by `GET` branch (as `web.method` does). If the
+    branch returns `None`, `default_handler` is called.
     '''
 
     def __init__(self, handlers_dict, default_handler=None):
         handlers = []
+        dispatch = {}
         for methods, handler in handlers_dict.items():
             if isinstance(methods, six.string_types):
                 methods = (methods,)
-            handlers.append(method(*methods, strict=False) | handler)
+            method_filter = method(*methods, strict=False)
+            for name in method_filter._names:
+                dispatch.setdefault(name, []).append(len(handlers))
+            handlers.append(method_filter | handler)
         if default_handler is not None:
             handlers.append(default_handler)
         else:
             handlers.append(HTTPMethodNotAllowed())
         cases.__init__(self, *handlers)
+        # indices of the branches to try by request method
+        default = len(handlers) - 1
+        self._default = (default,)
+        self._dispatch = dict((name, tuple(indices) + self._default)
+                              for name, indices in dispatch.items())
+
+    def by_method(self, env, data):
+        handlers = self.handlers
+        for index in self._dispatch.get(env.request.method, self._default):
+            env._push()
+            data._push()
+            try:
+                result = handlers[index](env, data)
+            finally:
+                env._pop()
+                data._pop()
+            if result is not None:
+                return result
+    __call__ = by_method
 
 
 class subdomain(WebHandler):
@@ -291,12 +355,22 @@ class subdomain(WebHandler):
                 matches = not subdomain
 
             if matches:
-                env._route_state = \
-                        env._route_state.add_subdomain(self.primary, subd)
-                return self.next_handler(env, data)
+                return self._handle_matched(env, data, subd)
         return None
     __call__ = subdomain
 
+    def _call_prematched(self, subd, groups, env, data):
+        # called by compiled routing, which has already found the first
+        # matching alias `subd` in the index of sibling handlers
+        return self._handle_matched(env, data, subd)
+
+    def _handle_matched(self, env, data, subd):
+        env._route_state = env._route_state.add_subdomain(self.primary, subd)
+        return self.next_handler(env, data)
+
+    def _route_prefix(self):
+        return self._next_route_prefix()
+
     def _locations(self):
         locations = WebHandler._locations(self)
         for location, scope in locations.values():
@@ -309,18 +383,44 @@ class subdomain(WebHandler):
 
 class static_files(WebHandler):
     '''
-    Static file handler for dev server (not recommended in production)::
+    Static file handler::
 
        static_files('/path/to/static', url='/static/')
+
+    Results of `os.stat` calls are cached for `stat_ttl` seconds (forever if
+    it is `None`). Responses have ETag and Last-Modified headers, support
+    conditional and range requests and are sent by `wsgi.file_wrapper` of
+    the server if it is available. `cache_max_age` sets Cache-Control
+    header. If `precompressed` is set, `.br` and `.gz` siblings of the file
+    are sent to the clients accepting these encodings.
+
+    `manifest` enables fingerprinted urls: `url_for_static` returns urls
+    with a hash of file content, which are served with far-future immutable
+    Cache-Control header. It is `iktomi.web.static.StaticManifest`,
+    a path to JSON file written by `StaticManifest.dump` or `True` to hash
+    the files on start. Files missing in the manifest are served by plain
+    urls.
+
+    Still serving static files by the front web server is preferred.
     '''
 
-    def __init__(self, location, url='/static/'):
+    def __init__(self, location, url='/static/', cache_max_age=None,
+                 precompressed=False, stat_ttl=1, manifest=None):
         self.location = location
         self.url = url
+        self.cache_max_age = cache_max_age
+        self.index = StatIndex(ttl=stat_ttl, precompressed=precompressed)
+        if manifest is True:
+            manifest = StaticManifest.build(location)
+        elif isinstance(manifest, six.string_types):
+            manifest = StaticManifest.load(manifest)
+        self.manifest = manifest
 
     def url_for_static(self, part):
         while part.startswith('/'):
             part = part[1:]
+        if self.manifest is not None:
+            part = self.manifest.hashed.get(part, part)
         return path.join(self.url, part)
 
     @deprecated("Use static.url_for_static instead")
@@ -351,9 +451,17 @@ class static_files(WebHandler):
         if path_info.startswith(self.url):
             if path_info.endswith('/'):
                 raise HTTPNotFound
-            file_path = self.translate_path(path_info[len(self.url):])
-            if file_path and path.exists(file_path) and path.isfile(file_path):
-                return FileApp(file_path)
+            name = path_info[len(self.url):]
+            immutable = False
+            if self.manifest is not None and \
+                    name in self.manifest.originals:
+                name = self.manifest.originals[name]
+                immutable = True
+            file_path = self.translate_path(name)
+            static = self.index.get(file_path) if file_path else None
+            if static is not None:
+                return StaticFileApp(static, cache_max_age=self.cache_max_age,
+                                     index=self.index, immutable=immutable)
             else:
                 logger.info('Client requested non existent static data "%s"',
                             file_path)
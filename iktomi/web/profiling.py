@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+'''
+Opt-in profiling of handler trees::
+
+    profiler = Profiler(sink=my_sink, flush_interval=60)
+    wsgi_app = Application(app, profiler=profiler)
+
+For each request the profiler records the time spent in each `WebHandler`
+of the tree, the number of `web.cases` branches tried and the number of
+`env` and `data` push/pop calls. Values are aggregated into histograms per
+endpoint name (`env.current_location` of the matched handler) and are passed
+to the sink periodically.
+
+Applications without profiler are not affected at all.
+'''
+
+__all__ = ['Profiler', 'RequestProfile', 'Histogram', 'log_sink',
+           'current_profile']
+
+import time
+import logging
+import threading
+from .core import WebHandler, cases
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+def current_profile():
+    '''Returns `RequestProfile` of the current request or `None`'''
+    return getattr(_local, 'profile', None)
+
+
+class Histogram(object):
+    '''
+    Counts of values falling into buckets with given upper bounds, the last
+    bucket is for values above all bounds.
+    '''
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0
+        self.max = None
+
+    def add(self, value):
+        index = 0
+        for bound in self.bounds:
+            if value <= bound:
+                break
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    @property
+    def mean(self):
+        return self.sum / float(self.count) if self.count else None
+
+    def __repr__(self):
+        return '{}(count={}, mean={!r}, max={!r})'.format(
+                self.__class__.__name__, self.count, self.mean, self.max)
+
+
+def _label(handler):
+    if isinstance(handler, cases):
+        # repr of cases contains the whole subtree
+        return '{}(..)'.format(handler.__class__.__name__)
+    return repr(handler)
+
+
+class RequestProfile(object):
+    '''Profile of a single request'''
+
+    def __init__(self):
+        self.endpoint = None
+        self.time = None
+        # (handler, seconds) in order of handlers return
+        self.handlers = []
+        self.branches = 0
+        self.pushes = 0
+        self.pops = 0
+        self._stack = []
+
+    def call(self, handler, func, env, data):
+        stack = self._stack
+        if stack and isinstance(stack[-1], cases):
+            self.branches += 1
+        stack.append(handler)
+        started = time.time()
+        try:
+            result = func(handler, env, data)
+        finally:
+            self.handlers.append((handler, time.time() - started))
+            stack.pop()
+        if result is not None and self.endpoint is None:
+            # the innermost handler returning a response
+            self.endpoint = env.current_location
+        return result
+
+    def handler_times(self):
+        '''Returns dict of handler label to the time spent in it'''
+        times = {}
+        for handler, seconds in self.handlers:
+            label = _label(handler)
+            times[label] = times.get(label, 0) + seconds
+        return times
+
+
+def log_sink(histograms):
+    '''Default sink writing mean and max values to the log'''
+    for endpoint, metrics in sorted(histograms.items(),
+                                    key=lambda x: x[0] or ''):
+        logger.info('%s: %s', endpoint, ', '.join(
+            '{}={:.6g}/{:.6g}'.format(name, h.mean, h.max)
+            for name, h in sorted(metrics.items())))
+
+
+class Profiler(object):
+    '''
+    Collects profiles of requests of `Application` and aggregates them to
+    histograms::
+
+        {endpoint: {'time': Histogram, 'branches': Histogram,
+                    'push': Histogram, 'pop': Histogram,
+                    'handler:match(...)': Histogram, ...}}
+
+    Endpoint is `None` for requests not matched by any handler. Aggregated
+    histograms are passed to `sink` callable and reset every
+    `flush_interval` seconds or on `flush` call.
+
+    Note that handlers of the tree are instrumented in place.
+    '''
+
+    time_bounds = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5)
+    count_bounds = (0, 1, 2, 5, 10, 20, 50, 100, 500)
+
+    def __init__(self, sink=log_sink, flush_interval=60):
+        self.sink = sink
+        self.flush_interval = flush_interval
+        self.histograms = {}
+        self._flushed = time.time()
+        self._lock = threading.Lock()
+        self._handler_classes = {}
+        self._instrumented = set()
+        self._storage_classes = {}
+
+    def _handler_class(self, cls):
+        if cls not in self._handler_classes:
+            call = cls.__call__
+
+            def __call__(self, env, data):
+                profile = current_profile()
+                if profile is None:
+                    return call(self, env, data)
+                return profile.call(self, call, env, data)
+            attrs = {'__call__': __call__, '__module__': cls.__module__,
+                     # compiled routing checks the type of handlers
+                     '_instrumented_class': cls}
+            if hasattr(cls, '_call_prematched'):
+                # web.match called by compiled routing
+                prematched = cls._call_prematched
+
+                def _call_prematched(self, matched, groups, env, data):
+                    profile = current_profile()
+                    if profile is None:
+                        return prematched(self, matched, groups, env, data)
+                    return profile.call(
+                        self, lambda h, e, d: prematched(h, matched, groups,
+                                                         e, d),
+                        env, data)
+                attrs['_call_prematched'] = _call_prematched
+            instrumented = type(cls.__name__, (cls,), attrs)
+            self._handler_classes[cls] = instrumented
+            self._instrumented.add(instrumented)
+        return self._handler_classes[cls]
+
+    def instrument(self, handler):
+        '''Instruments all handlers of the tree in place'''
+        handlers = [handler]
+        while handlers:
+            handler = handlers.pop()
+            if not isinstance(handler, WebHandler):
+                continue
+            if type(handler) not in self._instrumented:
+                handler.__class__ = self._handler_class(type(handler))
+            if isinstance(handler, cases):
+                handlers.extend(handler.handlers)
+            handlers.append(handler.next_handler)
+
+    def storage_class(self, cls):
+        '''Returns `cls` subclass counting push and pop calls'''
+        if cls not in self._storage_classes:
+            def _push(self, **kwargs):
+                profile = current_profile()
+                if profile is not None:
+                    profile.pushes += 1
+                return cls._push(self, **kwargs)
+
+            def _pop(self):
+                profile = current_profile()
+                if profile is not None:
+                    profile.pops += 1
+                return cls._pop(self)
+            attrs = {'_push': _push, '_pop': _pop,
+                     '__module__': cls.__module__}
+            if hasattr(cls, '__slots__'):
+                attrs['__slots__'] = ()
+            self._storage_classes[cls] = type(cls.__name__, (cls,), attrs)
+        return self._storage_classes[cls]
+
+    def handle(self, app, env, data):
+        '''Calls `app.handle` and records the profile of the request'''
+        profile = RequestProfile()
+        _local.profile = profile
+        started = time.time()
+        try:
+            return app.handle(env, data)
+        finally:
+            profile.time = time.time() - started
+            _local.profile = None
+            self.record(profile)
+
+    def _histogram(self, metrics, name, bounds):
+        if name not in metrics:
+            metrics[name] = Histogram(bounds)
+        return metrics[name]
+
+    def record(self, profile):
+        '''Adds the profile of a request to the histograms'''
+        with self._lock:
+            metrics = self.histograms.setdefault(profile.endpoint, {})
+            self._histogram(metrics, 'time', self.time_bounds)\
+                    .add(profile.time)
+            for name, value in (('branches', profile.branches),
+                                ('push', profile.pushes),
+                                ('pop', profile.pops)):
+                self._histogram(metrics, name, self.count_bounds).add(value)
+            for label, seconds in profile.handler_times().items():
+                self._histogram(metrics, 'handler:' + label,
+                                self.time_bounds).add(seconds)
+            flush = self.flush_interval is not None and \
+                    time.time() - self._flushed >= self.flush_interval
+        if flush:
+            self.flush()
+
+    def flush(self):
+        '''Passes aggregated histograms to the sink and resets them'''
+        with self._lock:
+            histograms, self.histograms = self.histograms, {}
+            self._flushed = time.time()
+        if histograms:
+            self.sink(histograms)
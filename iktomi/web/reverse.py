@@ -2,8 +2,8 @@
 
 __all__ = ['Reverse', 'UrlBuildingError']
 
-from .url import URL
-from .url_templates import UrlBuildingError
+from .url import URL, construct_url
+from .url_templates import UrlTemplate, UrlBuildingError, urlquote
 from ..utils import cached_property
 
 
@@ -75,16 +75,192 @@ class Location(object):
 
 
 
+def _flat_parts(builders):
+    # joins builder params of several UrlTemplates into a single list of
+    # literal strings and (variable name, converter) slots
+    parts = []
+    for builder in builders:
+        if type(builder) is not UrlTemplate:
+            return None
+        for part in builder._builder_params:
+            if parts and not isinstance(part, tuple) \
+                    and not isinstance(parts[-1], tuple):
+                parts[-1] += part
+            else:
+                parts.append(part)
+    return parts
+
+
+def _build_parts(parts, kwargs):
+    # the same as UrlTemplate.__call__ for flat parts
+    result = []
+    for part in parts:
+        if isinstance(part, tuple):
+            var, conv_obj = part
+            if var in kwargs:
+                value = kwargs[var]
+            elif conv_obj.default is not conv_obj.NotSet:
+                value = conv_obj.default
+            else:
+                raise UrlBuildingError('Missing argument for '
+                                       'URL builder: {}'.format(var))
+            result.append(conv_obj.to_url(value))
+        else:
+            result.append(part)
+    return ''.join(result)
+
+
+class IndexEntry(object):
+    '''
+    Namespace or endpoint in the flat index of `Reverse` built by
+    `build_index`.
+    '''
+
+    __slots__ = ('locations', 'scope', 'need_arguments', 'url_arguments',
+                 'is_endpoint', 'is_plain')
+
+    def __init__(self, locations, scopes):
+        #: locations on the way from the root to the name
+        self.locations = tuple(locations)
+        #: nested scope of the name
+        self.scope = scopes[-1]
+        #: whether each step needs arguments
+        self.need_arguments = tuple(x.need_arguments for x in locations)
+        #: arguments used by `Reverse.build_url`, the same as
+        #: `url_arguments` of all called reverses on the way
+        url_arguments = set()
+        for location, scope, need in zip(locations, scopes,
+                                         self.need_arguments):
+            if need:
+                url_arguments |= location.url_arguments
+                if scope and '' in scope:
+                    url_arguments |= scope[''][0].url_arguments
+        self.url_arguments = frozenset(url_arguments)
+        self.is_endpoint = not self.scope or '' in self.scope
+        # subclasses of Location may override building
+        self.is_plain = all(type(x) is Location for x in locations)
+
+
+def build_index(scope, reserved=()):
+    '''
+    Returns a dict of full dotted names of namespaces and endpoints in
+    `scope` to `IndexEntry`. Names containing `reserved` parts (attributes
+    of `Reverse`) are skipped, they are not accessible by attribute.
+    '''
+    index = {}
+    stack = [('', (), (), scope)]
+    while stack:
+        prefix, locations, scopes, scope = stack.pop()
+        for name, (location, nested) in scope.items():
+            if not name or name in reserved:
+                continue
+            entry_locations = locations + (location,)
+            entry_scopes = scopes + (nested,)
+            index[prefix + name] = IndexEntry(entry_locations, entry_scopes)
+            if nested:
+                stack.append((prefix + name + '.', entry_locations,
+                              entry_scopes, nested))
+    return index
+
+
+class ReverseIndex(object):
+    '''
+    Flat index of namespaces and endpoints of the root `Reverse`, it is
+    built by `build_index` on first lookup.
+    '''
+
+    def __init__(self, scope, reserved=()):
+        self.scope = scope
+        self.reserved = reserved
+
+    @cached_property
+    def entries(self):
+        return build_index(self.scope, self.reserved)
+
+    def get(self, name):
+        '''Returns `IndexEntry` for full dotted name or `None`'''
+        return self.entries.get(name)
+
+
+class EndpointBuilder(object):
+    '''
+    Precompiled builder of the URL for a dotted endpoint name, used by
+    `Reverse.build_url`. Holds flat list of literal path parts and converter
+    slots of all locations on the way to the endpoint, resolved host and
+    fragment builder.
+    '''
+
+    def __init__(self, path_parts, host, fragment_parts, url_arguments):
+        self.path_parts = path_parts
+        self.host = host
+        self.fragment_parts = fragment_parts
+        self.url_arguments = url_arguments
+
+    @classmethod
+    def compile(cls, reverse, entry):
+        '''
+        Returns a builder for `IndexEntry` of endpoint or `None` if it can
+        not be compiled.
+        '''
+        if not entry.is_endpoint or not entry.is_plain:
+            return None
+        locations = list(entry.locations)
+        if '' in entry.scope:
+            location = entry.scope[''][0]
+            if type(location) is not Location:
+                return None
+            if location.need_arguments and entry.locations and \
+                    not entry.need_arguments[-1]:
+                # the last step is ready and is not called with arguments,
+                # so the default endpoint is built without them and fails
+                return None
+            locations.append(location)
+        host = ''
+        fragment_builder = None
+        builders = []
+        for location in locations:
+            host = reverse._attach_subdomain(host, location)
+            builders += location.builders
+            if location.fragment_builder is not None:
+                fragment_builder = location.fragment_builder
+        path_parts = _flat_parts(builders)
+        fragment_parts = None
+        if fragment_builder is not None:
+            fragment_parts = _flat_parts([fragment_builder])
+            if fragment_parts is None:
+                return None
+        if path_parts is None:
+            return None
+        return cls(path_parts, host, fragment_parts, entry.url_arguments)
+
+    def build(self, kwargs):
+        '''Returns (path, host, fragment) tuple'''
+        for key in kwargs:
+            if key not in self.url_arguments:
+                raise UrlBuildingError('Not all arguments are used during '
+                                       'URL building: {}'.format(key))
+        fragment = None
+        if self.fragment_parts is not None:
+            fragment = _build_parts(self.fragment_parts, kwargs)
+        return _build_parts(self.path_parts, kwargs), self.host, fragment
+
+
 class Reverse(object):
     '''
     Object incapsulating reverse url map and methods needed to build urls
     by their names, namespaces and parameters.
 
     Usually an instance of `Reverse` can be found in `env.root`.
+
+    Reverse objects are not changed after creation. Argument-free
+    subreverses of the root returned by `Reverse.from_handler` (like
+    `root.news.index`) are created once and shared, the ones bound to `env`
+    are their shallow copies.
     '''
     def __init__(self, scope, location=None, path='', host='',
                  ready=False, need_arguments=False, bound_env=None, parent=None,
-                 finalize_params=None, pending_args=None, fragment=None):
+                 finalize_params=None, pending_args=None, fragment=None,
+                 builders=None, index=None, interned=None, intern_key=None):
         # location is stuff containing builders for current reverse step
         # (builds url part for particular namespace or endpoint)
         self._location = location
@@ -110,6 +286,16 @@ class Reverse(object):
         self._parent = parent
         self._finalize_params = finalize_params or {}
         self._pending_args = pending_args or {}
+        # cache of EndpointBuilder by endpoint name, shared by root reverse
+        # and its bound copies
+        self._builders = builders
+        # ReverseIndex shared by root reverse and its bound copies
+        self._index = index
+        # unbound argument-free subreverses by dotted name, shared by root
+        # reverse and its bound copies, see __getattr__
+        self._interned = interned
+        # dotted name of this reverse if it is interned ('' for the root)
+        self._intern_key = intern_key
 
     def _attach_subdomain(self, host, location):
         subdomain = location.build_subdomians(self)
@@ -164,6 +350,10 @@ class Reverse(object):
             if self._need_arguments:
                 return getattr(self(), name)
             location, scope = self._scope[name]
+            if self._intern_key is not None and \
+                    type(location) is Location and \
+                    not location.need_arguments:
+                return self._interned_subreverse(name, location, scope)
             path = self._path
             host = self._host
             fragment = self._fragment
@@ -184,6 +374,33 @@ class Reverse(object):
         raise UrlBuildingError('Namespace or endpoint "{}" does not exist'
                                ' in {!r}'.format(name, self))
 
+    def _interned_subreverse(self, name, location, scope):
+        # argument-free subreverse of interned one depends on the scope
+        # only, so the unbound one is shared and bound ones are its views
+        key = self._intern_key + '.' + name if self._intern_key else name
+        subreverse = self._interned.get(key)
+        if subreverse is None:
+            fragment = location.build_fragment(self)
+            subreverse = self.__class__(
+                    scope, location,
+                    self._path + location.build_path(self),
+                    self._attach_subdomain(self._host, location),
+                    True,
+                    fragment=self._fragment if fragment is None else fragment,
+                    interned=self._interned,
+                    intern_key=key)
+            self._interned[key] = subreverse
+        if self._bound_env is None:
+            return subreverse
+        return subreverse._view(self._bound_env)
+
+    def _view(self, bound_env):
+        # a copy bound to env sharing all the state
+        view = object.__new__(self.__class__)
+        view.__dict__.update(self.__dict__)
+        view._bound_env = bound_env
+        return view
+
     def _finalize(self):
         # deferred build of the last part of url for endpoints that
         # also have nested scopes
@@ -215,7 +432,66 @@ class Reverse(object):
                 args |= self._scope[''][0].url_arguments
         return args
 
+    def has_endpoint(self, name):
+        '''
+        Checks if there is an endpoint with dotted `name`::
+
+            env.root.has_endpoint('user.profile')
+        '''
+        if self._index is not None:
+            entry = self._index.get(name)
+            return entry is not None and entry.is_endpoint
+        scope = self._scope
+        for part in name.split('.'):
+            if not part or part not in scope:
+                return False
+            scope = scope[part][1]
+        return not scope or '' in scope
+
+    def _indexed_subreverse(self, entry, kwargs):
+        # the same reverse as the traversal in _build_url_silent returns,
+        # built without intermediate reverses
+        location = entry.locations[-1]
+        if not entry.is_plain or \
+                (location.need_arguments and not entry.is_endpoint):
+            # namespace waiting for arguments
+            return None
+        path, host, fragment = self._path, self._host, self._fragment
+        for location, need_arguments in zip(entry.locations,
+                                            entry.need_arguments):
+            host = self._attach_subdomain(host, location)
+            if need_arguments:
+                path += location.build_path(self, **kwargs)
+                loc_fragment = location.build_fragment(self, **kwargs)
+            else:
+                path += location.build_path(self)
+                loc_fragment = location.build_fragment(self)
+            if loc_fragment is not None:
+                fragment = loc_fragment
+        finalize_params = {}
+        if location.need_arguments and '' in entry.scope:
+            finalize_params = kwargs
+        return self.__class__(entry.scope, location, path=path, host=host,
+                              fragment=fragment,
+                              bound_env=self._bound_env,
+                              ready=True,
+                              finalize_params=finalize_params)
+
     def _build_url_silent(self, _name, **kwargs):
+        if self._index is not None:
+            entry = self._index.get(_name)
+            if entry is not None and self._intern_key == '' and \
+                    entry.is_plain and not any(entry.need_arguments):
+                # attribute access of the root returns interned reverse
+                subreverse = self._interned.get(_name)
+                if subreverse is not None:
+                    if self._bound_env is not None:
+                        subreverse = subreverse._view(self._bound_env)
+                    return set(), subreverse
+            elif entry is not None:
+                subreverse = self._indexed_subreverse(entry, kwargs)
+                if subreverse is not None:
+                    return set(entry.url_arguments), subreverse
         subreverse = self
         used_args = set()
         for part in _name.split('.'):
@@ -246,6 +522,16 @@ class Reverse(object):
         Checks that all necessary arguments are provided and all
         provided arguments are used.
         '''
+        builder = self._endpoint_builder(_name)
+        if builder is not None:
+            try:
+                path, host, fragment = builder.build(kwargs)
+            except UrlBuildingError:
+                # use regular way to get exactly the same error
+                pass
+            else:
+                return self._url(path, host, fragment)
+
         used_args, subreverse =  self._build_url_silent(_name, **kwargs)
 
         if set(kwargs).difference(used_args):
@@ -254,6 +540,68 @@ class Reverse(object):
                     .format(', '.join(set(kwargs).difference(used_args))))
         return subreverse.as_url
 
+    def build_urls(self, _name, _items, _strings=False, **kwargs):
+        '''
+        Bulk version of `build_url`. Returns an iterator of URLs for each
+        dict of arguments in `_items`, `kwargs` are common for all of them::
+
+            env.root.build_urls('news.item', [{'id': 1}, {'id': 2}],
+                                section='top')
+
+        The endpoint, host and port are resolved once. If `_strings` is set,
+        plain `str` values are returned instead of `web.URL` objects.
+        '''
+        builder = self._endpoint_builder(_name)
+        if builder is None:
+            return self._build_urls_silent(_name, _items, _strings, kwargs)
+        return self._build_urls_compiled(builder, _name, _items, _strings,
+                                         kwargs)
+
+    def _build_urls_silent(self, _name, _items, _strings, kwargs):
+        for item in _items:
+            url = self.build_url(_name, **dict(kwargs, **item))
+            yield str(url) if _strings else url
+
+    def _build_urls_compiled(self, builder, _name, _items, _strings, kwargs):
+        params = self._url_params(builder.host)
+        if _strings:
+            # the same as URL.__new__ does for URL without query
+            prefix = construct_url('', None,
+                                   params['host'] if params['show_host']
+                                                  else '',
+                                   params['port'],
+                                   params.get('scheme') or 'http')
+        for item in _items:
+            if kwargs:
+                item = dict(kwargs, **item)
+            try:
+                path, host, fragment = builder.build(item)
+            except UrlBuildingError:
+                # raise exactly the same error as build_url does
+                self.build_url(_name, **item)
+                raise
+            if not _strings:
+                yield URL(path, fragment=fragment, **params)
+            elif fragment is None:
+                yield prefix + urlquote(path)
+            else:
+                yield prefix + urlquote(path) + '#' + urlquote(fragment)
+
+    def _endpoint_builder(self, name):
+        builders = self._builders
+        if builders is None:
+            return None
+        try:
+            return builders[name]
+        except KeyError:
+            pass
+        entry = self._index.get(name) if self._index is not None else None
+        if entry is None:
+            # no such endpoint, let build_url raise an error
+            return None
+        builder = builders[name] = EndpointBuilder.compile(self, entry)
+        return builder
+
     @property
     def as_url(self):
         '''
@@ -269,11 +617,15 @@ class Reverse(object):
         if not self._is_endpoint:
             raise UrlBuildingError('Not an endpoint {}'.format(repr(self)))
 
-        if self._ready:
-            path, host = self._path, self._host
-        else:
+        if not self._ready:
             return self().as_url
+        return self._url(self._path, self._host, self._fragment)
+
+    def _url(self, path, host, fragment):
+        return URL(path, fragment=fragment, **self._url_params(host))
 
+    def _url_params(self, host):
+        # URL constructor arguments except path and fragment
         # XXX there is a little mess with `domain` and `host` terms
         if ':' in host:
             domain, port = host.split(':')
@@ -297,13 +649,12 @@ class Reverse(object):
             request_port = host_split[1] if len(host_split) > 1 else scheme_port
             port = port or request_port
 
-            return URL(path, host=domain or request_domain,
-                       port=port if port != scheme_port else None,
-                       scheme=request.scheme, fragment=self._fragment,
-                       show_host=host and (domain != primary_domain \
-                                           or port != request_port))
-        return URL(path, host=domain, port=port,
-                   fragment=self._fragment, show_host=True)
+            return dict(host=domain or request_domain,
+                        port=port if port != scheme_port else None,
+                        scheme=request.scheme,
+                        show_host=host and (domain != primary_domain \
+                                            or port != request_port))
+        return dict(host=domain, port=port, show_host=True)
 
     def __str__(self):
         '''URLencoded representation of the URL'''
@@ -317,7 +668,10 @@ class Reverse(object):
             app = web.cases(..)
             Reverse.from_handler(app)
         '''
-        return cls(handler._locations())
+        scope = handler._locations()
+        reserved = set(dir(cls)) | set(cls({}).__dict__)
+        return cls(scope, builders={}, index=ReverseIndex(scope, reserved),
+                   interned={}, intern_key='')
 
     def bind_to_env(self, bound_env):
         '''
@@ -327,14 +681,9 @@ class Reverse(object):
             # done in iktomi.web.app.Application
             env.root = Reverse.from_handler(app).bind_to_env(env)
         '''
-        return self.__class__(self._scope, self._location,
-                              path=self._path, host=self._host,
-                              fragment=self._fragment,
-                              ready=self._ready,
-                              need_arguments=self._need_arguments,
-                              finalize_params=self._finalize_params,
-                              parent=self._parent,
-                              bound_env=bound_env)
+        view = self._view(bound_env)
+        view._pending_args = {}
+        return view
 
     def __repr__(self):
         return '{}(path=\'{}\', host=\'{}\')'.format(
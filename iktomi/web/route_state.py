@@ -1,29 +1,54 @@
 # -*- coding: utf-8 -*-
 
 import logging
+from iktomi.utils import LRUCache
 
 logger = logging.getLogger(__name__)
 
+# idna-decoded domains of Host header values accepted by `Application`
+valid_hosts = LRUCache(1000)
+
+
+def decode_host(host):
+    '''Returns idna-decoded domain of Host header value without port'''
+    return host.split(':', 1)[0].encode('utf-8').decode('idna')
+
 
 class RouteState(object):
+    '''
+    State of routing: the remaining parts of request path and domain.
+    Filters replace it with updated copies, so it is restored when
+    `web.cases` pops `env` frame.
+    '''
+
+    __slots__ = ('request', 'path', '_domain', 'subdomain',
+                 'primary_subdomains', 'primary_domain')
+
     def __init__(self, request):
-        self._prefixes = ()
+        self.request = request
+        # remaining path for match
+        self.path = request.path
         # matched subdomain with aliases replaced by their main value
         self.primary_subdomains = () # tuple to be sure it's readonly
         self.primary_domain = ''
         # remaining subdomain part for match
-        self._domain = request.host.split(':', 1)[0].encode('utf-8').decode('idna')
+        host = request.host
+        self._domain = valid_hosts.get(host) or decode_host(host)
         self.subdomain = self._domain
-        self.request = request
 
     def __copy__(self):
         copy = object.__new__(type(self))
-        copy.__dict__.update(self.__dict__)
+        copy.request = self.request
+        copy.path = self.path
+        copy._domain = self._domain
+        copy.subdomain = self.subdomain
+        copy.primary_subdomains = self.primary_subdomains
+        copy.primary_domain = self.primary_domain
         return copy
 
     def add_prefix(self, prefix):
         self = self.__copy__()
-        self._prefixes += (prefix,)
+        self.path = self.path[len(prefix):]
         return self
 
     def add_subdomain(self, subdomain, alias_matched):
@@ -34,12 +59,3 @@ class RouteState(object):
         if alias_matched:
             self.subdomain = self.subdomain[:-len(alias_matched)].rstrip('.')
         return self
-
-    @property
-    def path(self):
-        path = self.request.path
-        if self._prefixes:
-            length = sum(map(len, self._prefixes))
-            path = path[length:]
-        return path
-
@@ -0,0 +1,394 @@
+# -*- coding: utf-8 -*-
+'''
+Precompiled dispatching for `web.cases`.
+
+Every branch of `web.cases` declares a static (urlencoded) path prefix
+which any request accepted by the branch must start with
+(see `WebHandler._route_prefix`). The prefixes are put into a trie
+of path segments, so a request path is checked against all branches
+in a single walk and only the branches that can possibly match are called.
+Branches with unknown prefix (custom filters, templates starting with
+a converter) are always called, their own regexps decide.
+
+Sibling `web.match` branches are also joined into a single regexp, so the
+first matching one is found by a single `re.match` call.
+
+Sibling `web.subdomain` branches are indexed by reversed labels of their
+subdomains and aliases, so the matching branches are found in O(labels) of
+the request domain.
+
+Not compiled `web.cases` in adaptive mode count hits of the branches and
+try the most hit static `web.match` branches first (see `BranchStats`).
+'''
+
+__all__ = ['PathTrie', 'MatchGroup', 'SubdomainGroup', 'CasesRouter',
+           'BranchStats']
+
+import re
+import six
+import functools
+
+
+class _Node(object):
+
+    __slots__ = ('children', 'entries')
+
+    def __init__(self):
+        self.children = {}
+        # (branch index, incomplete last segment of the prefix)
+        self.entries = []
+
+
+class PathTrie(object):
+    '''
+    A trie of '/'-separated path segments mapping static path prefixes
+    to branch indices.
+    '''
+
+    def __init__(self):
+        self._root = _Node()
+
+    def add(self, prefix, index):
+        segments = prefix.split('/')
+        node = self._root
+        for segment in segments[:-1]:
+            node = node.children.setdefault(segment, _Node())
+        node.entries.append((index, segments[-1]))
+
+    def lookup(self, path):
+        '''Returns sorted list of indices of prefixes `path` starts with'''
+        found = []
+        node = self._root
+        segments = path.split('/')
+        last = len(segments) - 1
+        for depth, segment in enumerate(segments):
+            for index, partial in node.entries:
+                if segment.startswith(partial):
+                    found.append(index)
+            if depth == last:
+                break
+            node = node.children.get(segment)
+            if node is None:
+                break
+        found.sort()
+        return found
+
+
+class MatchGroup(object):
+    '''
+    A sequence of sibling `web.match` branches, `handlers[start:stop]`,
+    with their patterns joined into a single alternation regexp.
+    Alternation tries the patterns in order, so the first matching branch
+    is the same as linear scan would find.
+    '''
+
+    def __init__(self, handlers, start, stop):
+        self.handlers = handlers
+        self.start = start
+        self.stop = stop
+        parts = []
+        for index in range(start, stop):
+            regex = handlers[index].builder._regex(
+                                        group_prefix=self._prefix(index))
+            parts.append('(?P<_b{}>{})'.format(index, regex))
+        self.pattern = re.compile('(?:{})'.format('|'.join(parts)))
+
+    @staticmethod
+    def _prefix(index):
+        return '_b{}_'.format(index)
+
+    def match(self, path):
+        '''
+        Returns index of the first matching branch and a callable accepting
+        `env` and `data` which calls the branch without matching the path
+        again, or `None` if nothing matches.
+        '''
+        m = self.pattern.match(path)
+        if m is None:
+            return None
+        # the outer group of the branch is the last closed one
+        index = int(m.lastgroup[2:])
+        handler = self.handlers[index]
+        prefix = self._prefix(index)
+        groups = dict((name, m.group(prefix + name))
+                      for name in handler.builder._url_params)
+        return index, functools.partial(handler._call_prematched,
+                                        m.group(m.lastgroup), groups)
+
+
+def _handler_type(handler):
+    # `Profiler` instruments handlers by replacing their class with a
+    # subclass, it keeps the original one
+    cls = type(handler)
+    return getattr(cls, '_instrumented_class', cls)
+
+
+def _is_joinable(handler):
+    from .filters import match
+    # subclasses may override matching, do not touch them
+    return _handler_type(handler) is match
+
+
+def _group_size(handler):
+    return 1 + len(handler.builder._url_params)
+
+
+# python 2 re module does not support more than 100 named groups
+MAX_GROUPS = 100 if six.PY2 else None
+
+
+def find_match_groups(handlers, max_groups=MAX_GROUPS):
+    '''
+    Returns (start, stop) pairs for runs of sibling `web.match` branches
+    that can be joined into `MatchGroup`.
+    '''
+    result = []
+    start = None
+    groups = 0
+    for index, handler in enumerate(handlers + [None]):
+        joinable = handler is not None and _is_joinable(handler)
+        if joinable and start is not None and max_groups is not None and \
+                groups + _group_size(handler) > max_groups:
+            result.append((start, index))
+            start = None
+        if joinable:
+            if start is None:
+                start, groups = index, 0
+            groups += _group_size(handler)
+        elif start is not None:
+            result.append((start, index))
+            start = None
+    return [(start, stop) for start, stop in result if stop - start > 1]
+
+
+class SubdomainGroup(object):
+    '''
+    A sequence of sibling `web.subdomain` branches, `handlers[start:stop]`,
+    indexed by reversed labels of their subdomains, e.g. `'a.b'` is
+    `('b', 'a')`.
+    '''
+
+    def __init__(self, handlers, start, stop):
+        self.handlers = handlers
+        self.start = start
+        self.stop = stop
+        # reversed labels: [(branch index, alias position, alias)]
+        self.index = {}
+        # `None` aliases matching any domain
+        self.always = []
+        for index in range(start, stop):
+            for position, alias in enumerate(handlers[index].subdomains):
+                entry = (index, position, alias)
+                if alias is None:
+                    self.always.append(entry)
+                else:
+                    key = tuple(reversed(alias.split('.'))) if alias else ()
+                    self.index.setdefault(key, []).append(entry)
+
+    def match(self, subdomain):
+        '''
+        Returns a dict of indices of matching branches to callables
+        accepting `env` and `data`, which call the branch with the alias
+        it would match by itself (the first matching one).
+        '''
+        found = list(self.always)
+        if subdomain:
+            labels = subdomain.split('.')
+            labels.reverse()
+            for length in range(1, len(labels) + 1):
+                found.extend(self.index.get(tuple(labels[:length]), ()))
+        else:
+            found.extend(self.index.get((), ()))
+        # the first alias of each branch goes first
+        found.sort(key=lambda entry: entry[:2])
+        result = {}
+        for index, position, alias in found:
+            if index not in result:
+                result[index] = functools.partial(
+                        self.handlers[index]._call_prematched, alias, None)
+        return result
+
+
+def _is_subdomain(handler):
+    from .filters import subdomain
+    return _handler_type(handler) is subdomain
+
+
+def find_subdomain_groups(handlers):
+    '''
+    Returns (start, stop) pairs for runs of sibling `web.subdomain`
+    branches.
+    '''
+    result = []
+    start = None
+    for index, handler in enumerate(handlers + [None]):
+        if handler is not None and _is_subdomain(handler):
+            if start is None:
+                start = index
+        elif start is not None:
+            result.append((start, index))
+            start = None
+    return [(start, stop) for start, stop in result if stop - start > 1]
+
+
+class CasesRouter(object):
+    '''
+    Chooses candidate branches of `web.cases` for the current request.
+    Order of branches is preserved, so "`None` means continue" semantics
+    stays the same as for linear scan.
+    '''
+
+    def __init__(self, handlers, prefixes):
+        self.handlers = handlers
+        self.trie = None
+        # the trie is useless if all branches have the same prefix
+        if len(set(prefixes)) > 1:
+            self.trie = PathTrie()
+            for index, prefix in enumerate(prefixes):
+                self.trie.add(prefix, index)
+        self.match_groups = {}
+        for start, stop in find_match_groups(handlers):
+            try:
+                group = MatchGroup(handlers, start, stop)
+            except (re.error, AssertionError):
+                # for example, converters regexps contain conflicting
+                # group names
+                continue
+            for index in range(start, stop):
+                self.match_groups[index] = group
+        self.subdomain_groups = {}
+        for start, stop in find_subdomain_groups(handlers):
+            group = SubdomainGroup(handlers, start, stop)
+            for index in range(start, stop):
+                self.subdomain_groups[index] = group
+
+    @property
+    def is_empty(self):
+        '''There is nothing to optimize, linear scan is as good as router'''
+        return self.trie is None and not self.match_groups and \
+                not self.subdomain_groups
+
+    def route(self, env):
+        '''
+        Returns a list of callables to be tried in order for current request.
+        '''
+        handlers = self.handlers
+        path = env._route_state.path
+        if self.trie is not None:
+            indices = self.trie.lookup(path)
+        else:
+            indices = range(len(handlers))
+        match_groups = self.match_groups
+        subdomain_groups = self.subdomain_groups
+        if not match_groups and not subdomain_groups:
+            return [handlers[i] for i in indices]
+
+        result = []
+        group = None
+        skip_to = 0
+        prematched = None
+        subdomain_group = None
+        for index in indices:
+            index_group = subdomain_groups.get(index)
+            if index_group is not None:
+                if index_group is not subdomain_group:
+                    subdomain_group = index_group
+                    matched = subdomain_group.match(
+                                    env._route_state.subdomain)
+                if index in matched:
+                    result.append(matched[index])
+                continue
+            index_group = match_groups.get(index)
+            if index_group is not None and index_group is not group:
+                group = index_group
+                found = group.match(path)
+                if found is None:
+                    # nothing in the group matches
+                    skip_to = group.stop
+                else:
+                    # the branches before found one do not match,
+                    # the branches after it are tried as usual
+                    # if found one returns None
+                    skip_to, prematched = found
+            if index < skip_to:
+                continue
+            if index == skip_to and prematched is not None:
+                result.append(prematched)
+                prematched = None
+            else:
+                result.append(handlers[index])
+        return result
+
+
+def _is_static_match(handler):
+    return _is_joinable(handler) and not handler.builder._url_params
+
+
+def find_static_runs(handlers):
+    '''
+    Returns (start, stop) pairs for runs of sibling `web.match` branches
+    with static templates. A path matches at most one of distinct static
+    templates, so the branches of such run can be tried in any order.
+    '''
+    result = []
+    start = None
+    templates = set()
+    for index, handler in enumerate(handlers + [None]):
+        static = handler is not None and _is_static_match(handler)
+        if static and start is not None and \
+                handler.builder.template in templates:
+            # the same template, order matters
+            result.append((start, index))
+            start = None
+        if static:
+            if start is None:
+                start, templates = index, set()
+            templates.add(handler.builder.template)
+        elif start is not None:
+            result.append((start, index))
+            start = None
+    return [(start, stop) for start, stop in result if stop - start > 1]
+
+
+class BranchStats(object):
+    '''
+    Hit and miss counters of `web.cases` branches in adaptive mode.
+    `hits[i]` and `misses[i]` are counted for `handlers[i]`, a hit is a
+    non-`None` result.
+
+    Every `reorder_every` calls the branches of runs found by
+    `find_static_runs` are sorted by hits, the rest keep their positions.
+    '''
+
+    reorder_every = 1000
+
+    def __init__(self, handlers):
+        self.handlers = handlers
+        self.hits = [0] * len(handlers)
+        self.misses = [0] * len(handlers)
+        self.runs = find_static_runs(handlers)
+        # indices of handlers in the order they are tried
+        self.order = list(range(len(handlers)))
+        self.calls = 0
+
+    def tried(self):
+        '''Returns (index, handler) pairs in the order to try'''
+        self.calls += 1
+        if self.runs and self.calls % self.reorder_every == 0:
+            self.reorder()
+        handlers = self.handlers
+        return [(index, handlers[index]) for index in self.order]
+
+    def reorder(self):
+        order = list(range(len(self.handlers)))
+        hits = self.hits
+        for start, stop in self.runs:
+            # sort is stable, so the initial order is kept for equal hits
+            order[start:stop] = sorted(order[start:stop],
+                                       key=lambda i: -hits[i])
+        # the list is replaced at once, it is safe for other threads
+        self.order = order
+
+    def __repr__(self):
+        return '{}(hits={!r}, misses={!r})'.format(
+                self.__class__.__name__, self.hits, self.misses)
@@ -0,0 +1,320 @@
+# -*- coding: utf-8 -*-
+'''
+Serving static files, used by `web.static_files`.
+'''
+
+__all__ = ['StaticFile', 'StaticFileApp', 'StatIndex', 'StaticManifest']
+
+import os
+import io
+import json
+import stat
+import time
+import hashlib
+import calendar
+import mimetypes
+import six
+from webob import Request
+from webob.exc import HTTPMethodNotAllowed, HTTPNotFound
+from webob.static import FileIter, BLOCK_SIZE
+from webob.datetime_utils import serialize_date, parse_date
+from iktomi.utils import LRUCache
+
+# precompressed siblings of the file in order of preference
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+# Cache-Control header value for fingerprinted files
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+class StaticFile(object):
+    '''
+    Result of `os.stat` call for a static file: path, size, modification
+    time and ETag. `variants` is a dict of content encoding to `StaticFile`
+    of precompressed sibling.
+    '''
+
+    def __init__(self, file_path, st, encoding=None):
+        self.path = file_path
+        self.size = st.st_size
+        self.mtime = int(st.st_mtime)
+        self.etag = '"{:x}-{:x}{}"'.format(int(st.st_mtime * 1000000),
+                                          st.st_size,
+                                          '-' + encoding if encoding else '')
+        self.encoding = encoding
+        self.variants = {}
+
+    def open(self):
+        return open(self.path, 'rb')
+
+
+def _stat_file(file_path):
+    try:
+        st = os.stat(file_path)
+    except (IOError, OSError):
+        return None
+    if not stat.S_ISREG(st.st_mode):
+        return None
+    return st
+
+
+class StatIndex(object):
+    '''
+    Bounded cache of `StaticFile` objects by file path. Missing files are
+    cached too. Entries older than `ttl` seconds are checked again, `ttl`
+    of `None` means files never change.
+    '''
+
+    def __init__(self, ttl=1, precompressed=False, maxsize=1000):
+        self.ttl = ttl
+        self.precompressed = precompressed
+        self._cache = LRUCache(maxsize)
+
+    def get(self, file_path):
+        '''Returns `StaticFile` or `None` if there is no such file'''
+        now = time.time()
+        entry = self._cache.get(file_path)
+        if entry is not None:
+            checked, static = entry
+            if checked is not None and \
+                    (self.ttl is None or now - checked < self.ttl):
+                return static
+        static = self._stat(file_path)
+        self._cache[file_path] = (now, static)
+        return static
+
+    def invalidate(self, file_path):
+        '''Forces `os.stat` call on next `get`'''
+        self._cache[file_path] = (None, None)
+
+    def _stat(self, file_path):
+        st = _stat_file(file_path)
+        if st is None:
+            return None
+        static = StaticFile(file_path, st)
+        if self.precompressed:
+            for encoding, ext in ENCODINGS:
+                variant_st = _stat_file(file_path + ext)
+                # outdated siblings are ignored
+                if variant_st is not None and \
+                        variant_st.st_mtime >= st.st_mtime:
+                    static.variants[encoding] = \
+                        StaticFile(file_path + ext, variant_st, encoding)
+        return static
+
+
+def _accepted_encodings(header):
+    result = set()
+    for item in header.split(','):
+        parts = item.split(';')
+        name = parts[0].strip().lower()
+        q = 1
+        for param in parts[1:]:
+            key, _, value = param.strip().partition('=')
+            if key.strip() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0
+        if q > 0:
+            result.add(name)
+    return result
+
+
+def _etag_matches(header, etag, weak=True):
+    if header.strip() == '*':
+        return True
+    for value in header.split(','):
+        value = value.strip()
+        if weak and value.startswith('W/'):
+            value = value[2:]
+        if value == etag:
+            return True
+    return False
+
+
+def _parse_timestamp(value):
+    date = parse_date(value) if value else None
+    if date is None:
+        return None
+    return calendar.timegm(date.utctimetuple())
+
+
+class StaticFileApp(object):
+    '''
+    WSGI application sending a `StaticFile`. Supports conditional requests
+    (`If-None-Match`, `If-Modified-Since`), single range requests
+    (`Range`, `If-Range`) and precompressed variants. Whole files are sent
+    with `wsgi.file_wrapper` if the server provides it, servers use
+    `sendfile` for it.
+    '''
+
+    def __init__(self, static, cache_max_age=None, index=None,
+                 immutable=False):
+        self.static = static
+        self.cache_max_age = cache_max_age
+        self.index = index
+        self.immutable = immutable
+
+    def _headers(self, static, variant):
+        content_type, _ = mimetypes.guess_type(static.path)
+        content_type = content_type or 'application/octet-stream'
+        if content_type.startswith('text/'):
+            content_type += '; charset=UTF-8'
+        headers = [('Content-Type', content_type),
+                   ('Last-Modified', serialize_date(variant.mtime)),
+                   ('ETag', variant.etag),
+                   ('Accept-Ranges', 'bytes')]
+        if static.variants:
+            headers.append(('Vary', 'Accept-Encoding'))
+        if variant.encoding:
+            headers.append(('Content-Encoding', variant.encoding))
+        if self.immutable:
+            headers.append(('Cache-Control', IMMUTABLE))
+        elif self.cache_max_age is not None:
+            headers.append(('Cache-Control',
+                            'public, max-age={}'.format(self.cache_max_age)))
+        return headers
+
+    def _choose_variant(self, environ):
+        static = self.static
+        if static.variants and 'HTTP_RANGE' not in environ:
+            accepted = _accepted_encodings(
+                            environ.get('HTTP_ACCEPT_ENCODING', ''))
+            for encoding, ext in ENCODINGS:
+                if encoding in accepted and encoding in static.variants:
+                    return static.variants[encoding]
+        return static
+
+    def _is_not_modified(self, environ, variant):
+        if_none_match = environ.get('HTTP_IF_NONE_MATCH')
+        if if_none_match is not None:
+            return _etag_matches(if_none_match, variant.etag)
+        since = _parse_timestamp(environ.get('HTTP_IF_MODIFIED_SINCE'))
+        return since is not None and variant.mtime <= since
+
+    def _range(self, request, variant):
+        # returns (start, stop) of requested range, None for whole file or
+        # False if the range is not satisfiable
+        if request.range is None:
+            return None
+        if_range = request.environ.get('HTTP_IF_RANGE')
+        if if_range:
+            if if_range.startswith('"') or if_range.startswith('W/'):
+                # weak tags never match for ranges
+                if not _etag_matches(if_range, variant.etag, weak=False):
+                    return None
+            elif _parse_timestamp(if_range) != variant.mtime:
+                return None
+        content_range = request.range.content_range(variant.size)
+        if content_range is None:
+            return False
+        return content_range.start, content_range.stop
+
+    def __call__(self, environ, start_response):
+        method = environ['REQUEST_METHOD']
+        if method not in ('GET', 'HEAD'):
+            return HTTPMethodNotAllowed()(environ, start_response)
+        static = self.static
+        variant = self._choose_variant(environ)
+        headers = self._headers(static, variant)
+        if self._is_not_modified(environ, variant):
+            start_response('304 Not Modified', headers)
+            return []
+
+        request = Request(environ)
+        byte_range = self._range(request, variant)
+        if byte_range is False:
+            start_response('416 Requested Range Not Satisfiable',
+                           headers + [('Content-Range',
+                                       'bytes */{}'.format(variant.size)),
+                                      ('Content-Length', '0')])
+            return []
+        try:
+            f = variant.open()
+        except (IOError, OSError):
+            if self.index is not None:
+                self.index.invalidate(static.path)
+            return HTTPNotFound()(environ, start_response)
+
+        if byte_range is not None:
+            start, stop = byte_range
+            start_response('206 Partial Content', headers + [
+                ('Content-Range', 'bytes {}-{}/{}'.format(start, stop - 1,
+                                                          variant.size)),
+                ('Content-Length', str(stop - start))])
+            if method == 'HEAD':
+                f.close()
+                return []
+            return FileIter(f).app_iter_range(start, stop)
+
+        start_response('200 OK',
+                       headers + [('Content-Length', str(variant.size))])
+        if method == 'HEAD':
+            f.close()
+            return []
+        if 'wsgi.file_wrapper' in environ:
+            return environ['wsgi.file_wrapper'](f, BLOCK_SIZE)
+        return FileIter(f)
+
+
+class StaticManifest(object):
+    '''
+    Mapping of static file paths (relative to static directory,
+    /-separated) to the paths with a hash of file content::
+
+        manifest = StaticManifest.build('/path/to/static')
+        manifest.hashed['css/site.css'] # 'css/site.1a2b3c4d5e6f.css'
+
+    Build it on deploy and load it on startup to avoid reading all files
+    by each process::
+
+        StaticManifest.build(cfg.STATIC).dump(cfg.STATIC_MANIFEST)
+        manifest = StaticManifest.load(cfg.STATIC_MANIFEST)
+
+    Fingerprinted urls are cached forever, so the manifest must be rebuilt
+    whenever the files are changed.
+    '''
+
+    hash_length = 12
+
+    def __init__(self, hashed):
+        self.hashed = hashed
+        self.originals = dict((v, k) for k, v in hashed.items())
+
+    @classmethod
+    def hashed_name(cls, name, digest):
+        base, ext = os.path.splitext(name)
+        return '{}.{}{}'.format(base, digest[:cls.hash_length], ext)
+
+    @staticmethod
+    def file_digest(file_path):
+        hasher = hashlib.md5()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(BLOCK_SIZE), b''):
+                hasher.update(block)
+        return hasher.hexdigest()
+
+    @classmethod
+    def build(cls, location):
+        '''Reads all files in `location` directory and hashes them'''
+        hashed = {}
+        for dir_path, dir_names, file_names in os.walk(location):
+            for file_name in file_names:
+                file_path = os.path.join(dir_path, file_name)
+                name = os.path.relpath(file_path, location)\
+                                .replace(os.sep, '/')
+                hashed[name] = cls.hashed_name(name,
+                                               cls.file_digest(file_path))
+        return cls(hashed)
+
+    @classmethod
+    def load(cls, file_path):
+        '''Loads manifest written by `dump`'''
+        with io.open(file_path, encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def dump(self, file_path):
+        data = json.dumps(self.hashed, indent=0, sort_keys=True)
+        with io.open(file_path, 'w', encoding='utf-8') as f:
+            f.write(six.text_type(data))
@@ -10,22 +10,29 @@ else:# pragma: no cover; we check coverage only in python2 part
 from webob.multidict import MultiDict
 from .url_templates import urlquote
 from iktomi.utils.url import uri_to_iri_parts
+from iktomi.utils import cached_property
 
 
 def construct_url(path, query, host, port, scheme, fragment=None):
-    query = ('?' + '&'.join('{}={}'.format(urlquote(k), urlquote(v))
-                            for k, v in six.iteritems(query))
-             if query else '')
-
+    query = _construct_query(query) if query else ''
     hash_part = ('#' + fragment) if fragment is not None else ''
 
     if host:
-        host = host.encode('idna').decode('utf-8')
-        port = ':' + port if port else ''
-        return ''.join((scheme, '://', host, port, path, query, hash_part))
+        return _construct_prefix(host, port, scheme) + path + query + hash_part
     else:
         return path + query + hash_part
 
+
+def _construct_query(query):
+    return '?' + '&'.join('{}={}'.format(urlquote(k), urlquote(v))
+                          for k, v in six.iteritems(query))
+
+
+def _construct_prefix(host, port, scheme):
+    host = host.encode('idna').decode('utf-8')
+    port = ':' + port if port else ''
+    return ''.join((scheme, '://', host, port))
+
 if six.PY2:
     def _parse_qs(query):
         return sum([[(k.decode('utf-8', errors="replace"),
@@ -69,6 +76,10 @@ class URL(str):
     #     query - dict of unicode keys and unicode or implementing
     #             string convertion values
     #     fragment - None or urlencoded string of text_type
+    #
+    # `host` and empty `query` are computed on first access, the string
+    # value is built from parts with no extra work for relative URLs
+    # without query.
 
     def __new__(cls, path=None, query=None, host=None, port=None, scheme=None,
                 fragment=None, show_host=True, uri_path=None, uri_fragment=None):
@@ -101,24 +112,46 @@ class URL(str):
         #       and is uncompatible with RFC.
         fragment = uri_fragment or _decode_path(fragment)
 
-        query = MultiDict(query) if query else MultiDict()
-        host = host or ''
-        port = port or ''
-        scheme = scheme or 'http'
-        _self = construct_url(path, query, host if show_host else '',
-                              port, scheme, fragment)
-        self = str.__new__(cls, _self)
-        self.path = path
-        self.query = query
+        return cls._from_parts(path, MultiDict(query) if query else None,
+                               host or '', port or '', scheme or 'http',
+                               fragment, show_host)
 
-        # force decode idna from both encoded and decoded input
-        self.host = '.'.join(safe_idna(x) for x in host.split('.'))
+    @classmethod
+    def _from_parts(cls, path, query, host, port, scheme, fragment,
+                    show_host, prefix=None):
+        # Fast constructor. Path and fragment must be urlencoded, query is
+        # None or MultiDict owned by the new object, host is not decoded.
+        # Prefix is scheme, host and port part of the string if it is
+        # already known.
+        if prefix is None:
+            prefix = _construct_prefix(host, port, scheme) \
+                        if show_host and host else ''
+        value = prefix + path
+        if query:
+            value += _construct_query(query)
+        if fragment is not None:
+            value += '#' + fragment
+        self = str.__new__(cls, value)
+        self.path = path
+        if query:
+            self.query = query
+        self._host = host
+        self._prefix = prefix
         self.port = port
         self.scheme = scheme
         self.fragment = fragment
         self.show_host = show_host
         return self
 
+    @cached_property
+    def query(self):
+        return MultiDict()
+
+    @cached_property
+    def host(self):
+        # force decode idna from both encoded and decoded input
+        return '.'.join(safe_idna(x) for x in self._host.split('.'))
+
     @classmethod
     def from_url(cls, url, show_host=True):
         '''Parse string and get URL instance'''
@@ -161,6 +194,12 @@ class URL(str):
             kw['uri_fragment'] = self.fragment
         return self.__class__(**kw)
 
+    def _with_query(self, query):
+        # query is a new MultiDict, the rest parts are shared
+        return self._from_parts(self.path, query, self._host, self.port,
+                                self.scheme, self.fragment, self.show_host,
+                                self._prefix)
+
     def qs_set(self, *args, **kwargs):
         '''Set values in QuerySet MultiDict'''
         if args and kwargs:
@@ -176,7 +215,7 @@ class URL(str):
         else:
             for k, v in kwargs.items():
                 query[k] = v
-        return self._copy(query=query)
+        return self._with_query(query)
 
     def qs_add(self, *args, **kwargs):
         '''Add value to QuerySet MultiDict'''
@@ -187,7 +226,7 @@ class URL(str):
                 query.add(k, v)
         for k, v in kwargs.items():
             query.add(k, v)
-        return self._copy(query=query)
+        return self._with_query(query)
 
     def with_host(self):
         '''Force show_host parameter'''
@@ -201,7 +240,7 @@ class URL(str):
                 del query[key]
             except KeyError:
                 pass
-        return self._copy(query=query)
+        return self._with_query(query)
 
     def qs_get(self, key, default=None):
         '''Get a value from QuerySet MultiDict'''
@@ -1,8 +1,13 @@
 # -*- coding: utf-8 -*-
 import six
+if six.PY2:
+    from urllib import unquote
+else:# pragma: no cover
+    from urllib.parse import unquote
 
 from inspect import isclass
 from datetime import datetime
+from ..utils import LRUCache
 
 __all__ = ['ConvertError', 'default_converters', 'Converter', 'String',
            'Integer', 'Any', 'Date']
@@ -23,12 +28,46 @@ class ConvertError(Exception):
         return self.args[1]
 
 
+if six.PY2:
+    def unquote_value(value):
+        '''Unquotes urlencoded url part to unicode'''
+        if '%' in value:
+            value = unquote(value)
+        if isinstance(value, six.binary_type):
+            value = value.decode('utf-8', 'replace')
+        return value
+else:# pragma: no cover
+    def unquote_value(value):
+        '''Unquotes urlencoded url part to unicode'''
+        if '%' in value:
+            return unquote(value)
+        return value
+
+
+def _overrides(obj, cls, *names):
+    # checks if the class of obj overrides any of cls methods
+    for name in names:
+        if six.get_unbound_function(getattr(type(obj), name)) is not \
+                six.get_unbound_function(getattr(cls, name)):
+            return True
+    return False
+
+
+_missing = object()
+
+
 class Converter(object):
-    '''A base class for urlconverters'''
+    '''A base class for urlconverters
+
+    Set `pure` to `True` if the result of `to_python` depends on the value
+    only (not on `env`) and can be shared between requests. Results of pure
+    converters are cached in LRU cache of `pure_cache_size` items.'''
 
     regex = '[.a-zA-Z0-9:@&+$,_%%-]+'
     class NotSet(object): pass
     default = NotSet
+    pure = False
+    pure_cache_size = 1000
 
     def __init__(self, default=NotSet, regex=None):
         if not default is self.NotSet:
@@ -51,6 +90,28 @@ class Converter(object):
         '''
         raise NotImplementedError() # pragma: no cover
 
+    def _compile(self):
+        '''
+        Returns a function converting urlencoded url part to python object,
+        used by `UrlTemplate` to convert matched values.
+        '''
+        to_python = self.to_python
+        if not self.pure:
+            def convert(value, **kw):
+                return to_python(unquote_value(value), **kw)
+            return convert
+
+        cache = LRUCache(self.pure_cache_size)
+        def convert_cached(value, **kw):
+            result = cache.get(value, _missing)
+            if result is _missing:
+                # errors are not cached
+                result = to_python(unquote_value(value), **kw)
+                cache[value] = result
+            return result
+        convert_cached.cache = cache
+        return convert_cached
+
 
 class String(Converter):
     '''
@@ -79,6 +140,18 @@ class String(Converter):
         if length < self.min or self.max and length > self.max:
             raise ConvertError(self, value)
 
+    def _compile(self):
+        if _overrides(self, String, 'to_python', 'check_len') or self.pure:
+            return Converter._compile(self)
+        min, max = self.min, self.max
+        def convert(value, **kw):
+            value = unquote_value(value)
+            length = len(value)
+            if length < min or max and length > max:
+                raise ConvertError(self, value)
+            return value
+        return convert
+
 
 class Integer(Converter):
     '''
@@ -104,6 +177,17 @@ class Integer(Converter):
             return value
         return str(int(value))
 
+    def _compile(self):
+        if _overrides(self, Integer, 'to_python') or self.pure:
+            return Converter._compile(self)
+        def convert(value, **kw):
+            value = unquote_value(value)
+            try:
+                return int(value)
+            except ValueError:
+                raise ConvertError(self, value)
+        return convert
+
 
 class Any(Converter):
     '''
@@ -121,6 +205,20 @@ class Any(Converter):
             return value
         raise ConvertError(self, value)
 
+    def _compile(self):
+        if _overrides(self, Any, 'to_python') or self.pure:
+            return Converter._compile(self)
+        try:
+            values = frozenset(self.values)
+        except TypeError:
+            return Converter._compile(self)
+        def convert(value, **kw):
+            value = unquote_value(value)
+            if value in values:
+                return value
+            raise ConvertError(self, value)
+        return convert
+
     def to_url(self, value):
         if six.PY3 and isinstance(value, bytes):
             raise TypeError() # pragma: no cover, safety check
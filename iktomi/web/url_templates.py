@@ -1,13 +1,14 @@
 # -*- coding: utf-8 -*-
 import six
 if six.PY2:
-    from urllib import quote, unquote
+    from urllib import quote
 else:# pragma: no cover
-    from urllib.parse import quote, unquote
+    from urllib.parse import quote
 
 import re
 import logging
 from .url_converters import default_converters, ConvertError
+from ..utils import cached_property
 
 logger = logging.getLogger(__name__)
 
@@ -36,7 +37,8 @@ _converter_pattern = re.compile(r'''^<
 _static_url_pattern = re.compile(r'^[^<]*?$')
 
 def construct_re(url_template, match_whole_str=False, converters=None,
-                 default_converter='string', anonymous=False):
+                 default_converter='string', anonymous=False, group_prefix='',
+                 compiled=True):
     '''
     url_template - str or unicode representing template
 
@@ -48,6 +50,12 @@ def construct_re(url_template, match_whole_str=False, converters=None,
 
     If anonymous=True is set, regexp will be compiled without names of variables.
     This is handy for example, if you want to dump an url map to JSON.
+
+    group_prefix is prepended to names of variable groups. It allows to join
+    multiple patterns into a single regexp.
+
+    If compiled=False is set, source of the pattern is returned instead of
+    compiled pattern.
     '''
     # needed for reverse url building (or not needed?)
     builder_params = []
@@ -77,22 +85,122 @@ def construct_re(url_template, match_whole_str=False, converters=None,
             if anonymous:
                 result += conv_object.regex
             else:
-                result += '(?P<{}>{})'.format(variable, conv_object.regex)
+                result += '(?P<{}{}>{})'.format(group_prefix, variable,
+                                                conv_object.regex)
             continue
         raise ValueError('Incorrect url template {!r}'.format(url_template))
     if match_whole_str:
         result += '$'
-    return re.compile(result), url_params, builder_params
+    if compiled:
+        result = re.compile(result)
+    return result, url_params, builder_params
+
+
+_converter_arg_pattern = re.compile(r'''
+        \s*
+        (?:(?P<name>[a-zA-Z_][a-zA-Z0-9_]*)\s*=\s*)?    # keyword
+        (?:
+            (?P<prefix>[uUbBrR]{0,2})                   # string prefix
+            (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*') |
+            (?P<number>[-+]?(?:\d+\.\d*|\.\d+|\d+)(?:[eE][-+]?\d+)?) |
+            (?P<bare>[^\W\d]\w*)                         # unquoted string
+        )
+        \s*(?:,|$)''', re.VERBOSE | re.U)
+
+_escape_pattern = re.compile(
+        r'\\(x[0-9a-fA-F]{2}|u[0-9a-fA-F]{4}|U[0-9a-fA-F]{8}|[0-7]{1,3}|.)',
+        re.U | re.S)
+_escapes = {'\\': '\\', "'": "'", '"': '"', '\n': '',
+            'a': '\a', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r',
+            't': '\t', 'v': '\v'}
+_constants = {'True': True, 'False': False, 'None': None}
+
+
+def _unescape(string, is_bytes):
+    # the same as python does for string literals, unknown escapes are
+    # kept with the backslash
+    def replace(match):
+        value = match.group(1)
+        if value in _escapes:
+            return _escapes[value]
+        first = value[0]
+        if first in 'uU' and is_bytes:
+            return '\\' + value
+        if first in 'xuU':
+            if len(value) == 1:
+                raise ValueError('Incorrect \\{} escape in converter '
+                                 'argument {!r}'.format(first, string))
+            return six.unichr(int(value[1:], 16))
+        if first in '01234567':
+            return six.unichr(int(value, 8))
+        return '\\' + value
+    return _escape_pattern.sub(replace, string)
+
+
+def _converter_arg(match):
+    string, number, bare = match.group('string', 'number', 'bare')
+    if string is not None:
+        prefix = match.group('prefix').lower()
+        string = string[1:-1]
+        is_bytes = 'b' in prefix
+        if is_bytes and any(ord(c) > 127 for c in string):
+            raise ValueError('Bytes converter argument {!r} can only contain '
+                             'ASCII characters'.format(string))
+        if 'r' not in prefix:
+            string = _unescape(string, is_bytes)
+        if is_bytes and not isinstance(string, six.binary_type):
+            string = string.encode('latin-1')
+        return string
+    if number is not None:
+        if number.isdigit() or number[1:].isdigit():
+            return int(number)
+        return float(number)
+    return _constants.get(bare, bare)
+
+
+def parse_converter_args(args):
+    '''
+    Parses converter arguments string, like `a, "b, c", max=1`,
+    to (args, kwargs) pair. Quoted strings, numbers and `True`, `False`,
+    `None` constants are supported, other unquoted names are strings.
+    '''
+    result_args, result_kwargs = [], {}
+    pos = 0
+    while pos < len(args):
+        match = _converter_arg_pattern.match(args, pos)
+        if match is None:
+            if not args[pos:].strip():
+                break
+            raise ValueError('Incorrect converter arguments '
+                             '{!r}'.format(args))
+        pos = match.end()
+        name = match.group('name')
+        value = _converter_arg(match)
+        if name is not None:
+            result_kwargs[str(name)] = value
+        elif result_kwargs:
+            raise ValueError('Positional argument after keyword argument '
+                             'in {!r}'.format(args))
+        else:
+            result_args.append(value)
+    return tuple(result_args), result_kwargs
 
 
+# converter instances are shared by all templates
+_converters_cache = {}
+
 def init_converter(conv_class, args):
+    key = (conv_class, args)
+    try:
+        return _converters_cache[key]
+    except KeyError:
+        pass
     if args:
-        #XXX: taken from werkzeug
-        storage = type('_Storage', (), {'__getitem__': lambda s, x: x})()
-        args, kwargs = eval(u'(lambda *a, **kw: (a, kw))({})'.format(args),
-                            {}, storage)
-        return conv_class(*args, **kwargs)
-    return conv_class()
+        args, kwargs = parse_converter_args(args)
+        converter = conv_class(*args, **kwargs)
+    else:
+        converter = conv_class()
+    return _converters_cache.setdefault(key, converter)
 
 
 class UrlTemplate(object):
@@ -101,12 +209,38 @@ class UrlTemplate(object):
                  default_converter='string'):
         self.template = template
         self.match_whole_str = match_whole_str
+        self._default_converter = default_converter
         self._allowed_converters = self._init_converters(converters)
-        self._pattern, self._url_params, self._builder_params = \
+        self._source, self._url_params, self._builder_params = \
             construct_re(template,
                          match_whole_str=match_whole_str,
                          converters=self._allowed_converters,
-                         default_converter=default_converter)
+                         default_converter=default_converter,
+                         compiled=False)
+
+    @cached_property
+    def _pattern(self):
+        # compiled on first use, most of templates are never matched
+        # in a worker process or are matched by joined regexps
+        return re.compile(self._source)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # compiled objects are restored on demand
+        state.pop('_pattern', None)
+        state.pop('_converters', None)
+        return state
+
+    @cached_property
+    def static_prefix(self):
+        '''
+        Urlencoded static part of the template before the first url param.
+        Each path matched by the template starts with this value.
+        '''
+        if self._builder_params and \
+                not isinstance(self._builder_params[0], tuple):
+            return urlquote(self._builder_params[0])
+        return ''
 
     def match(self, path, **kw):
         '''
@@ -114,26 +248,51 @@ class UrlTemplate(object):
         '''
         m = self._pattern.match(path)
         if m:
-            kwargs = m.groupdict()
-            # convert params
-            for url_arg_name, value_urlencoded in kwargs.items():
-                conv_obj = self._url_params[url_arg_name]
-                unicode_value = unquote(value_urlencoded)
-                if isinstance(unicode_value, six.binary_type):
-                    # XXX ??
-                    unicode_value = unicode_value.decode('utf-8', 'replace')
-                try:
-                    kwargs[url_arg_name] = conv_obj.to_python(unicode_value, **kw)
-                except ConvertError as err:
-                    logger.debug('ConvertError in parameter "%s" '
-                                 'by %r, value "%s"',
-                                 url_arg_name,
-                                 err.converter.__class__,
-                                 err.value)
-                    return None, {}
-            return m.group(), kwargs
+            return self._convert(m.group(), m.groupdict(), **kw)
         return None, {}
 
+    def _convert(self, matched, kwargs, **kw):
+        '''
+        Converts urlencoded values of url params matched by the pattern
+        (or its copy made by `_regex`).
+        '''
+        # convert params
+        converters = self._converters
+        for url_arg_name, value_urlencoded in kwargs.items():
+            try:
+                kwargs[url_arg_name] = converters[url_arg_name](
+                                                    value_urlencoded, **kw)
+            except ConvertError as err:
+                logger.debug('ConvertError in parameter "%s" '
+                             'by %r, value "%s"',
+                             url_arg_name,
+                             err.converter.__class__,
+                             err.value)
+                return None, {}
+        return matched, kwargs
+
+    @cached_property
+    def _converters(self):
+        '''Compiled converting functions of url params'''
+        return dict((name, conv_obj._compile())
+                    for name, conv_obj in self._url_params.items())
+
+    def _regex(self, group_prefix=''):
+        '''
+        Source of the pattern without leading "^" and with variable group
+        names prefixed by `group_prefix`. The pattern is not compiled, it is
+        joined with other ones by compiled routing.
+        '''
+        if not group_prefix:
+            return self._source[1:]
+        source = construct_re(self.template,
+                              match_whole_str=self.match_whole_str,
+                              converters=self._allowed_converters,
+                              default_converter=self._default_converter,
+                              group_prefix=group_prefix,
+                              compiled=False)[0]
+        return source[1:]
+
     def __call__(self, **kwargs):
         'Url building with url params values taken from kwargs. (reverse)'
         result = ''
@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+'''
+Performance benchmarks.
+
+They are run with the rest of tests with a small number of rounds just to be
+sure they work. Set IKTOMI_BENCHMARK_ROUNDS environment variable to get
+meaningful timings, for example::
+
+    IKTOMI_BENCHMARK_ROUNDS=1000 py.test tests/benchmarks.py -s
+'''
+
+__all__ = ['StartupBenchmark', 'RouteStateBenchmark', 'StorageBenchmark',
+           'ReverseBenchmark', 'URLBenchmark', 'MatchBenchmark']
+
+import os
+import sys
+import time
+import unittest
+from webob import Request, Response
+from iktomi import web
+from iktomi.utils.storage import VersionedStorage, FlatVersionedStorage
+from iktomi.utils.paginator import Paginator
+from iktomi.web.url_templates import UrlTemplate
+
+ROUNDS = int(os.environ.get('IKTOMI_BENCHMARK_ROUNDS', 1))
+
+
+def bench(func, rounds=ROUNDS):
+    '''Returns the best time of a single `func` call'''
+    best = None
+    for i in range(rounds):
+        started = time.time()
+        func()
+        spent = time.time() - started
+        if best is None or spent < best:
+            best = spent
+    return best
+
+
+def report(name, **timings):
+    if 'IKTOMI_BENCHMARK_ROUNDS' in os.environ:
+        sys.stderr.write('\n{}: {}\n'.format(name, ', '.join(
+            '{}={:.6f}s'.format(k, v) for k, v in sorted(timings.items()))))
+
+
+def handler(env, data):
+    return Response()
+
+
+def build_app(sections=20, routes=100):
+    '''Builds a tree of `sections * routes` routes'''
+    return web.request_filter(lambda e, d, nxt: nxt(e, d)) | web.cases(*[
+        web.prefix('/section{}'.format(i), name='section{}'.format(i)) | \
+            web.cases(*[
+                web.match('/route{}/<int:id>'.format(j), 'route{}'.format(j)) |
+                    web.method('GET')
+                for j in range(routes)
+            ]) | handler
+        for i in range(sections)
+    ])
+
+
+class StartupBenchmark(unittest.TestCase):
+
+    def test_build_tree(self):
+        'Building a tree of 2000 routes'
+        built = bench(build_app)
+        app = build_app()
+        first_call = bench(lambda: web.ask(app, '/section19/route99/1'))
+        reverse = bench(lambda: web.Reverse.from_handler(build_app()))
+        report('build 2000 routes', build=built, first_call=first_call,
+               build_and_reverse=reverse)
+        self.assertEqual(web.ask(build_app(), '/section19/route99/1').status_int,
+                         200)
+
+    def test_templates(self):
+        'Compiling 1000 templates with converter arguments'
+        def build():
+            return [UrlTemplate('/<any(news,docs):s>/{}/<int(default=0):id>'
+                                .format(i)) for i in range(1000)]
+        report('compile 1000 templates', build=bench(build))
+        self.assertEqual(build()[1].match('/news/1/2')[1],
+                         {'s': 'news', 'id': 2})
+
+    def test_long_chain(self):
+        'Chaining 100 filters one by one'
+        def build():
+            chain = web.request_filter(lambda e, d, nxt: nxt(e, d))
+            for i in range(100):
+                chain = chain | web.request_filter(lambda e, d, nxt: nxt(e, d))
+            return chain | handler
+        built = bench(build)
+        report('chain 100 filters', build=built)
+        self.assertEqual(web.ask(build(), '/').status_int, 200)
+
+
+class RouteStateBenchmark(unittest.TestCase):
+
+    def test_nested_prefixes(self):
+        'Routing 1000 requests through 20 nested prefixes'
+        app = web.match('/item', 'item') | handler
+        for i in reversed(range(20)):
+            app = web.prefix('/p{}'.format(i), name='p{}'.format(i)) | \
+                    web.cases(web.match('/index', 'index') | handler, app)
+        wsgi_app = web.Application(app)
+        path = ''.join('/p{}'.format(i) for i in range(20)) + '/item'
+
+        def route():
+            for i in range(1000):
+                Request.blank(path).get_response(wsgi_app)
+        report('20 nested prefixes x1000', route=bench(route))
+        self.assertEqual(Request.blank(path).get_response(wsgi_app)
+                         .status_int, 200)
+
+
+class StorageBenchmark(unittest.TestCase):
+
+    def run_storage(self, storage_class, depth=20):
+        env = storage_class(web.AppEnvironment, request=None, root=None)
+        env.db = 'db'
+        for i in range(depth):
+            env._push()
+            env.value = i
+        for i in range(100):
+            env.db, env.request, env.value, env.current_location
+            # a branch of web.cases
+            env._push()
+            env.value = i
+            env._pop()
+        for i in range(depth):
+            env._pop()
+        return env
+
+    def test_lookup_and_rollback(self):
+        'Attribute lookup and push/pop with 20 frames pushed'
+        timings = {}
+        for storage_class in (VersionedStorage, FlatVersionedStorage):
+            timings[storage_class.__name__] = bench(
+                    lambda: self.run_storage(storage_class))
+            env = self.run_storage(storage_class)
+            self.assertEqual(env.db, 'db')
+            self.assertEqual(env.as_dict().get('value'), None)
+        report('storage 20 frames deep', **timings)
+
+
+class ReverseBenchmark(unittest.TestCase):
+
+    def test_build_url(self):
+        'Building 1000 URLs by name'
+        root = web.Reverse.from_handler(build_app())
+        # reverse without builders cache uses regular way
+        plain = web.Reverse(root._scope)
+
+        def build(reverse):
+            return [reverse.build_url('section19.route99', id=i)
+                    for i in range(1000)]
+        report('build_url x1000', compiled=bench(lambda: build(root)),
+               regular=bench(lambda: build(plain)))
+        self.assertEqual(build(root), build(plain))
+
+    def test_build_subreverse(self):
+        'Building 1000 subreverses by name'
+        root = web.Reverse.from_handler(build_app())
+        plain = web.Reverse(root._scope)
+
+        def build(reverse):
+            return [reverse.build_subreverse('section19.route99', id=i)
+                    for i in range(1000)]
+        report('build_subreverse x1000', indexed=bench(lambda: build(root)),
+               regular=bench(lambda: build(plain)),
+               has_endpoint=bench(lambda: [root.has_endpoint('section19.x')
+                                           for i in range(1000)]))
+        self.assertEqual([str(x) for x in build(root)],
+                         [str(x) for x in build(plain)])
+
+    def test_bound_attributes(self):
+        'Binding root and getting 1000 argument-free subreverses'
+        app = web.cases(*[
+            web.prefix('/section{}'.format(i), name='section{}'.format(i)) | \
+                web.cases(web.match('/', 'index'), web.match('/list', 'list'))
+            for i in range(10)])
+        root = web.Reverse.from_handler(app)
+        env = web.AppEnvironment.create(Request.blank('/'), root)
+
+        def build():
+            bound = root.bind_to_env(env)
+            return [bound.section9.list for i in range(1000)]
+        report('bound subreverses x1000', attributes=bench(build))
+        self.assertEqual(str(build()[0]), '/section9/list')
+
+    def test_build_urls(self):
+        'Building 1000 URLs by name at once'
+        root = web.Reverse.from_handler(build_app())
+        items = [{'id': i} for i in range(1000)]
+        report('build_urls x1000',
+               urls=bench(lambda: list(root.build_urls('section19.route99',
+                                                       items))),
+               strings=bench(lambda: list(root.build_urls('section19.route99',
+                                                          items,
+                                                          _strings=True))))
+        self.assertEqual(list(root.build_urls('section19.route99', items)),
+                         [root.build_url('section19.route99', **item)
+                          for item in items])
+
+
+class URLBenchmark(unittest.TestCase):
+
+    def test_as_url(self):
+        'Reverse.as_url for 1000 relative and absolute URLs'
+        root = web.Reverse.from_handler(build_app())
+        reverse = root.section19.route99
+        other = web.Reverse.from_handler(web.subdomain('example.com') |
+                                         build_app()).section19.route99
+
+        def build(reverse):
+            return [reverse(id=i).as_url for i in range(1000)]
+        report('as_url x1000', relative=bench(lambda: build(reverse)),
+               absolute=bench(lambda: build(other)))
+        self.assertEqual(build(reverse)[1], '/section19/route99/1')
+        self.assertEqual(build(other)[1],
+                         'http://example.com/section19/route99/1')
+
+    def test_paginator_pages(self):
+        'Paginator.pages for 100 pages'
+        request = Request.blank('/news/list?page=50&sort=date')
+
+        def pages():
+            return Paginator(request, limit=10, count=1000,
+                             impl=lambda count, page: range(1, count + 1)).pages
+        report('paginator pages x100', pages=bench(pages))
+        self.assertEqual(pages()[1].url, '/news/list?sort=date&page=2')
+        self.assertEqual(pages()[0].url, '/news/list?sort=date')
+
+
+class MatchBenchmark(unittest.TestCase):
+
+    def test_url_template_match(self):
+        'Matching and converting url params 1000 times'
+        template = UrlTemplate('/<any(news,docs):section>/<int:id>/<slug>')
+
+        def match():
+            for i in range(1000):
+                template.match('/news/{}/some-slug'.format(i))
+        report('UrlTemplate.match x1000', match=bench(match))
+        self.assertEqual(template.match('/news/1/x')[1],
+                         {'section': 'news', 'id': 1, 'slug': 'x'})
+
+    def test_adaptive_cases(self):
+        'Routing 1000 requests to the last of 100 static branches'
+        def build(adaptive):
+            return web.cases(*[web.match('/route{}'.format(i),
+                                         'route{}'.format(i)) | handler
+                               for i in range(100)], adaptive=adaptive)
+
+        def route(app):
+            for i in range(1000):
+                web.ask(app, '/route99')
+        adaptive = build(True)
+        route(adaptive)
+        report('static cases x1000', plain=bench(lambda: route(build(False))),
+               adaptive=bench(lambda: route(adaptive)))
+        self.assertEqual(adaptive.stats.order[0], 99)
+
+    def test_subdomains(self):
+        'Routing 1000 requests to the last of 500 tenant subdomains'
+        def build(compile_routes):
+            return web.Application(web.subdomain('example.com') | web.cases(*[
+                web.subdomain('tenant{}'.format(i), name='tenant{}'.format(i))
+                    | web.match('/', 'index') | handler
+                for i in range(500)]), compile_routes=compile_routes)
+
+        def route(app):
+            for i in range(1000):
+                Request.blank('/', headers={'Host': 'tenant499.example.com'})\
+                        .get_response(app)
+        plain, compiled = build(False), build(True)
+        report('tenant subdomains x1000', plain=bench(lambda: route(plain)),
+               compiled=bench(lambda: route(compiled)))
+        self.assertEqual(Request.blank('/', headers={
+                'Host': 'tenant499.example.com'}).get_response(compiled)\
+                .status_int, 200)
@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+
+import sys
+
+collect_ignore = []
+if sys.version_info < (3, 5):
+    # coroutine syntax is not supported
+    collect_ignore.append('web/asgi.py')
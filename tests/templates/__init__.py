@@ -1,8 +1,12 @@
 import os
+import shutil
 import unittest
+import tempfile
 from iktomi import web
-from iktomi.templates import Template, TemplateError, BoundTemplate
+from iktomi.templates import Template, TemplateError, BoundTemplate, \
+                             buffered
 from iktomi.templates.jinja2 import TemplateEngine
+from iktomi.utils.storage import VersionedStorage, FlatVersionedStorage
 
 try:
     from unittest.mock import Mock
@@ -94,3 +98,74 @@ class BoundTemplateTest(unittest.TestCase):
         self.assertIn('class="big"', rendered)
         self.assertIn('readonly="readonly"', rendered)
         self.assertIn('>Sample text<', rendered)
+
+    def test_render_to_response_not_modified(self):
+        render = Mock(side_effect=self.bound.render)
+        self.bound.render = render
+        self.bound.env.request = web.Request.blank(
+                '/', headers={'If-None-Match': '"v1"'})
+        self.bound.env.conditional = web.Conditional(self.bound.env.request)
+        self.bound.env.conditional.set(etag='v1')
+        response = self.bound.render_to_response('widgets/textarea', {})
+        self.assertEqual(response.status_int, 304)
+        self.assertEqual(response.headers['ETag'], '"v1"')
+        self.assertFalse(render.called)
+
+
+class StreamTest(unittest.TestCase):
+
+    def setUp(self):
+        templates_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, templates_dir)
+        with open(os.path.join(templates_dir, 'list.html'), 'w') as f:
+            f.write('{% for i in range(count) %}<li>{{ i }} {{ title }}</li>'
+                    '{% endfor %}')
+        with open(os.path.join(templates_dir, 'env.html'), 'w') as f:
+            f.write('{{ env.user }} {{ env.current_location }} '
+                    '{{ env.root.page.as_url }}')
+        template = self.template = Template(templates_dir,
+                            engines={'html': TemplateEngine(templates_dir)},
+                            globs={'title': u'й'})
+        self.bound = BoundTemplate(web.AppEnvironment.create(), template)
+
+    def test_stream(self):
+        chunks = list(self.bound.stream('list', count=3))
+        self.assertGreater(len(chunks), 3)
+        self.assertEqual(u''.join(chunks),
+                         self.bound.render('list', count=3))
+
+    def test_render_to_response(self):
+        self.bound.stream_buffer_size = 100
+        response = self.bound.render_to_response('list', {'count': 100},
+                                                 stream=True)
+        self.assertIn('charset=utf-8', response.headers['Content-Type'])
+        self.assertNotIn('Content-Length', response.headers)
+        blocks = list(response.app_iter)
+        self.assertTrue(all(len(x) >= 100 for x in blocks[:-1]))
+        self.assertTrue(all(len(x) < 120 for x in blocks))
+        self.assertEqual(b''.join(blocks),
+                         self.bound.render('list', count=100).encode('utf-8'))
+
+    def test_buffered(self):
+        self.assertEqual(list(buffered([u'ab', u'c', u'й', u'd'], 3)),
+                         [b'abc', u'йd'.encode('utf-8')])
+        self.assertEqual(list(buffered([], 3)), [])
+
+    def test_env_state(self):
+        @web.request_filter
+        def set_user(env, data, nxt):
+            env.user = 'alice'
+            return nxt(env, data)
+
+        def page(env, data):
+            return BoundTemplate(env, self.template).render_to_response(
+                    'env', {'env': env}, stream=self.stream)
+        app = web.cases(
+            web.match('/', 'index'),
+            web.prefix('/p') | web.match('', 'page') | set_user | page,
+        )
+        for storage_class in (VersionedStorage, FlatVersionedStorage):
+            for self.stream in (False, True):
+                response = web.ask(app, '/p', storage_class=storage_class)
+                # frames pushed by cases are popped at this point
+                self.assertEqual(response.body, b'alice page /p')
@@ -3,7 +3,7 @@
 import unittest
 from iktomi.utils import (
     quoteattr, quoteattrs, quote_js, weakproxy,
-    cached_property, cached_class_property,
+    cached_property, cached_class_property, LRUCache,
 )
 
 
@@ -98,6 +98,20 @@ class Tests(unittest.TestCase):
         self.assertEqual(obj.p, 'a')
         self.assertEqual(C.c, 1)
 
+    def test_lru_cache(self):
+        cache = LRUCache(2)
+        cache['a'] = 1
+        cache['b'] = 2
+        self.assertEqual(cache.get('a'), 1)
+        # 'b' is least recently used
+        cache['c'] = 3
+        self.assertEqual(len(cache), 2)
+        self.assert_('b' not in cache)
+        self.assertEqual(cache.get('b', 0), 0)
+        self.assertEqual((cache.get('a'), cache.get('c')), (1, 3))
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
 #    def test_cached_property_attribute_error(self):
 #        class C(object):
 #            @cached_property
@@ -1,10 +1,11 @@
 # -*- coding: utf-8 -*-
 
-__all__ = ['VersionedStorageTests']
+__all__ = ['VersionedStorageTests', 'FlatVersionedStorageTests']
 
 import unittest
-from iktomi.utils.storage import VersionedStorage, StorageFrame, \
-        storage_property, storage_cached_property, storage_method
+from iktomi.utils.storage import VersionedStorage, FlatVersionedStorage, \
+        StorageFrame, storage_property, storage_cached_property, \
+        storage_method
 
 
 class VersionedStorageTests(unittest.TestCase):
@@ -48,6 +49,19 @@ class VersionedStorageTests(unittest.TestCase):
         vs._pop()
         self.assertEqual(vs.as_dict(), {'a': 1})
 
+    def test_snapshot(self):
+        vs = VersionedStorage(a=1)
+        vs._push(b=2)
+        state = vs._snapshot()
+        vs._pop()
+        vs._push(c=3)
+        previous = vs._restore(state)
+        self.assertEqual(vs.as_dict(), {'a': 1, 'b': 2})
+        vs._pop()
+        self.assertEqual(vs.as_dict(), {'a': 1})
+        vs._restore(previous)
+        self.assertEqual(vs.as_dict(), {'a': 1, 'c': 3})
+
     def test_setattr(self):
         'VersionedStorage setattr and push/pop'
         vs = VersionedStorage(a=1)
@@ -104,3 +118,107 @@ class VersionedStorageTests(unittest.TestCase):
         self.assertRaises(AttributeError, lambda: vs.storage)
         self.assertRaises(AttributeError, vs.method)
 
+
+class FlatVersionedStorageTests(unittest.TestCase):
+
+    def test_push_pop(self):
+        vs = FlatVersionedStorage(a=1)
+        self.assertEqual(vs._push(b=2), vs)
+        vs._push(c=3, b=4)
+        self.assertEqual(vs.as_dict(), {'a': 1, 'b': 4, 'c': 3})
+        self.assertEqual((vs.a, vs.b, vs.c), (1, 4, 3))
+
+        vs._pop()
+        self.assertEqual(vs.as_dict(), {'a': 1, 'b': 2})
+        self.assert_(not hasattr(vs, 'c'))
+
+        vs._pop()
+        self.assertEqual(vs.as_dict(), {'a': 1})
+        self.assertRaises(AttributeError, lambda: vs.b)
+
+    def test_snapshot(self):
+        vs = FlatVersionedStorage(a=1)
+        vs._push(b=2)
+        state = vs._snapshot()
+        vs._pop()
+        vs._push(c=3)
+        previous = vs._restore(state)
+        self.assertEqual(vs.as_dict(), {'a': 1, 'b': 2})
+        vs._pop()
+        self.assertEqual(vs.as_dict(), {'a': 1})
+        vs._restore(previous)
+        self.assertEqual(vs.as_dict(), {'a': 1, 'c': 3})
+
+    def test_setattr(self):
+        vs = FlatVersionedStorage(a=1)
+        vs._push()
+        vs.a = 2
+        vs.b = 2
+        vs._push()
+        vs.a = 3
+        vs.a = 4
+        vs.c = 3
+        self.assertEqual(vs.as_dict(), {'a': 4, 'b': 2, 'c': 3})
+
+        vs._pop()
+        self.assertEqual(vs.as_dict(), {'a': 2, 'b': 2})
+        vs._pop()
+        self.assertEqual(vs.as_dict(), {'a': 1})
+
+        # attributes set on the root level are kept in the root frame
+        vs.d = 5
+        self.assertEqual(vs._root.d, 5)
+        self.assertEqual(vs.__dict__, {})
+
+    def test_delattr(self):
+        vs = FlatVersionedStorage(a=1)
+        vs._push(b=2)
+        vs._push()
+        vs.b = 3
+        vs.c = 4
+        del vs.b
+        del vs.c
+        self.assertEqual(vs.as_dict(), {'a': 1, 'b': 2})
+        # the attribute is not set in the current frame
+        self.assertRaises(AttributeError, delattr, vs, 'b')
+        vs._pop()
+        del vs.b
+        vs._pop()
+        del vs.a
+        self.assertEqual(vs.as_dict(), {})
+
+    def test_storage_properties(self):
+        class Env(StorageFrame):
+
+            @storage_cached_property
+            def storage_cached(self):
+                return self.value
+
+            @storage_property
+            def storage(self):
+                return self.value
+
+            @storage_method
+            def method(self):
+                return self.value
+
+            def frame_method(self):
+                return self.value
+
+        vs = FlatVersionedStorage(Env, value=0)
+        vs._push(value=4)
+        self.assertEqual(vs.storage, 4)
+        self.assertEqual(vs.method(), 4)
+        # regular methods hold the state of the root frame
+        self.assertEqual(vs.frame_method(), 0)
+
+        vs._push(value=1)
+        self.assertEqual(vs.storage_cached, 1)
+        self.assertEqual(vs.storage, 1)
+        self.assertEqual(vs.method(), 1)
+
+        vs._pop()
+        vs._pop()
+        self.assertEqual(vs.storage_cached, 1)
+        self.assertEqual(vs.storage, 0)
+        self.assertEqual(vs._root_storage, vs)
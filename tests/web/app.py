@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 
-__all__ = ['ApplicationTests']
+__all__ = ['ApplicationTests', 'RouteStateTests']
 
 import sys
 import unittest
@@ -8,7 +8,8 @@ from webob import Response, Request
 from webob.exc import HTTPMethodNotAllowed
 from iktomi import web
 from iktomi.web.app import Application, AppEnvironment, is_host_valid
-from iktomi.utils.storage import VersionedStorage
+from iktomi.web.route_state import valid_hosts, RouteState
+from iktomi.utils.storage import VersionedStorage, FlatVersionedStorage
 from iktomi.utils import cached_property
 # import as TA because py.test generates warning about TestApp name
 from webtest import TestApp as TA
@@ -105,11 +106,81 @@ class ApplicationTests(unittest.TestCase):
         wa = Application(self.app, AppEnv)
         assert wa.env_class == AppEnv
 
+    def test_storage_class(self):
+        @web.request_filter
+        def set_value(env, data, next_handler):
+            env.value = data.id
+            return next_handler(env, data)
+
+        def handler(env, data):
+            return Response(u'{} {} {}'.format(env.current_location, env.value,
+                                               env.root.other.item(id=2)))
+
+        app = web.cases(
+            web.prefix('/news', name='news') | web.cases(
+                web.match('/<int:id>', 'item') | set_value | \
+                        (lambda e, d: None)),
+            web.prefix('/news', name='other') | web.cases(
+                web.match('/<int:id>', 'item') | set_value | handler))
+        wa = Application(app, storage_class=FlatVersionedStorage)
+        self.assertEqual(TA(wa).get('/news/1').body, b'other.item 1 /news/2')
+        self.assertEqual(web.ask(wa, '/news/1').body, b'other.item 1 /news/2')
+
     def test_ivalid_hostname(self):
         app = TA(self.wsgi_app)
         self.assertEqual(app.get('http://example.com/').body, b'index')
         app.get('http://.example.com/', status=404)
 
+    def test_host_cache(self):
+        valid_hosts.clear()
+        app = TA(self.wsgi_app)
+        app.get('http://xn--e1afmkfd.xn--p1ai:8000/')
+        self.assertEqual(valid_hosts.get('xn--e1afmkfd.xn--p1ai:8000'),
+                         u'пример.рф')
+        app.get('http://.example.com/', status=404)
+        self.assertNotIn('.example.com', valid_hosts)
+        # broken punycode passes the regexp, but is not valid
+        app.get('http://xn--a.com/', status=404)
+
+    def test_allowed_hosts(self):
+        wsgi_app = Application(self.app, allowed_hosts=['Example.com',
+                                                        'www.example.com'])
+        app = TA(wsgi_app)
+        self.assertEqual(app.get('http://example.com/').body, b'index')
+        self.assertEqual(app.get('http://WWW.example.com:8000/').body,
+                         b'index')
+        app.get('http://other.example.com/', status=404)
+        # valid host cached by another application is not allowed
+        self.assertEqual(TA(self.wsgi_app).get('http://localhost/').body,
+                         b'index')
+        app.get('http://localhost/', status=404)
+
+    def test_allowed_idna_hosts(self):
+        wsgi_app = Application(self.app, allowed_hosts=[u'пример.рф',
+                                                        'xn--d1acufc.xn--p1ai'])
+        app = TA(wsgi_app)
+        self.assertEqual(app.get('http://xn--e1afmkfd.xn--p1ai/').body,
+                         b'index')
+        self.assertEqual(app.get('http://XN--D1ACUFC.xn--p1ai/').body,
+                         b'index')
+        app.get('http://example.com/', status=404)
+
+
+class RouteStateTests(unittest.TestCase):
+
+    def test_route_state(self):
+        state = RouteState(Request.blank('/a/b/c',
+                                         headers={'Host': 'x.example.com'}))
+        nested = state.add_prefix('/a').add_prefix('/b')
+        self.assertEqual(nested.path, '/c')
+        self.assertEqual(state.path, '/a/b/c')
+        domain = nested.add_subdomain('example.com', 'example.com')
+        self.assertEqual(domain.subdomain, 'x')
+        self.assertEqual(domain.primary_domain, 'example.com')
+        self.assertEqual(domain.path, '/c')
+        self.assertEqual(nested.subdomain, 'x.example.com')
+        self.assertFalse(hasattr(state, '__dict__'))
+
 
 class HostnameValidationTest(unittest.TestCase):
 
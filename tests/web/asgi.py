@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+
+__all__ = ['AsgiApplicationTests']
+
+import asyncio
+import unittest
+import threading
+from webob import Response
+from iktomi import web
+from iktomi.web.asgi import AsgiApplication
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+async def request(app, path, method='GET', body=b'', query_string=b'',
+                  headers=()):
+    scope = {'type': 'http', 'method': method, 'path': path,
+             'query_string': query_string, 'scheme': 'http',
+             'server': ('example.com', 80), 'client': ('127.0.0.1', 5000),
+             'headers': [(b'host', b'example.com')] + list(headers)}
+    messages = [{'type': 'http.request', 'body': body[:2],
+                 'more_body': True},
+                {'type': 'http.request', 'body': body[2:]}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    start = sent[0]
+    assert start['type'] == 'http.response.start'
+    assert not sent[-1].get('more_body')
+    return (start['status'], dict(start['headers']),
+            b''.join(x['body'] for x in sent[1:]))
+
+
+class AsgiApplicationTests(unittest.TestCase):
+
+    def setUp(self):
+        self.active = []
+        self.overlap = []
+        lock = threading.Lock()
+        # all 4 concurrent requests have to get here to go on
+        barrier = threading.Barrier(4, timeout=5)
+
+        def slow(env, data):
+            with lock:
+                self.active.append(1)
+                self.overlap.append(len(self.active))
+            barrier.wait()
+            with lock:
+                self.active.pop()
+            return Response(body=b'slow')
+
+        def post(env, data):
+            return Response(body=env.request.body + b' ' +
+                            env.request.GET['q'].encode('utf-8'))
+
+        def stream(env, data):
+            return Response(app_iter=iter([b'a', b'b', b'c']))
+
+        self.app = AsgiApplication(web.cases(
+            web.match('/', 'index') | (lambda e, d: Response(body=b'index')),
+            web.match('/slow', 'slow') | slow,
+            web.match('/post', 'post') | web.method('POST') | post,
+            web.match('/stream', 'stream') | stream,
+            web.match('/url', 'url') | (lambda e, d: None),
+            web.match('/url', 'url2') | \
+                (lambda e, d: Response(body=e.root.url.as_url)),
+            web.match('/500', 'err500') | (lambda e, d: 1 + ''),
+        ), max_workers=4)
+        self.addCleanup(self.app.shutdown)
+
+    def test_sync_handler(self):
+        status, headers, body = run(request(self.app, '/'))
+        self.assertEqual(status, 200)
+        self.assertEqual(body, b'index')
+        self.assertEqual(headers[b'content-length'], b'5')
+
+    def test_not_found(self):
+        status, headers, body = run(request(self.app, '/missing'))
+        self.assertEqual(status, 404)
+
+    def test_error(self):
+        status, headers, body = run(request(self.app, '/500'))
+        self.assertEqual(status, 500)
+
+    def test_body_and_query(self):
+        status, headers, body = run(request(
+            self.app, '/post', method='POST', body=b'hello',
+            query_string=b'q=%D0%B9',
+            headers=[(b'content-type', b'text/plain')]))
+        self.assertEqual(status, 200)
+        self.assertEqual(body, u'hello й'.encode('utf-8'))
+
+    def test_stream(self):
+        status, headers, body = run(request(self.app, '/stream'))
+        self.assertEqual(body, b'abc')
+
+    def test_returns_none(self):
+        # cases goes on with the next branch
+        status, headers, body = run(request(self.app, '/url'))
+        self.assertEqual(body, b'/url')
+
+    def test_concurrent_requests(self):
+        async def requests():
+            return await asyncio.gather(*[request(self.app, '/slow')
+                                          for i in range(4)])
+        responses = run(requests())
+        self.assertEqual([x[2] for x in responses], [b'slow'] * 4)
+        # handlers are called in 4 threads at the same time
+        self.assertEqual(max(self.overlap), 4)
+
+    def test_lifespan(self):
+        messages = [{'type': 'lifespan.startup'},
+                    {'type': 'lifespan.shutdown'}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message['type'])
+        self.app.executor
+        run(self.app({'type': 'lifespan'}, receive, send))
+        self.assertEqual(sent, ['lifespan.startup.complete',
+                                'lifespan.shutdown.complete'])
+        self.assertEqual(self.app._executor, None)
@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+
+__all__ = ['CacheResponseTests', 'ConditionalTests']
+
+import os
+import time
+import shutil
+import tempfile
+import hashlib
+import datetime
+import unittest
+import threading
+from webob import Request, Response
+from iktomi import web
+from iktomi.web.app import Application
+from iktomi.storage import LocalMemStorage
+
+
+class CacheResponseTests(unittest.TestCase):
+
+    def setUp(self):
+        self.storage = LocalMemStorage()
+        self.calls = []
+
+    def app(self, **kwargs):
+        def item(env, data):
+            self.calls.append(data.id)
+            response = Response(body=u'{} {} {}'.format(
+                        data.id, env.request.GET.get('page'),
+                        len(self.calls)).encode('utf-8'))
+            response.headers['X-Id'] = str(data.id)
+            return response
+
+        def cookie(env, data):
+            self.calls.append(None)
+            response = Response(body=b'cookie')
+            response.set_cookie('a', 'b')
+            return response
+        cache = web.cache_response(self.storage, data=['id'],
+                                   query=['page'], **kwargs)
+        return web.cases(
+            web.match('/<int:id>', 'item') | cache | item,
+            web.match('/cookie', 'cookie') | cache | cookie,
+            web.match('/none', 'none') | cache,
+            web.match('/none', 'none2') | (lambda e, d: Response(b'next')),
+        )
+
+    def test_cache(self):
+        app = self.app()
+        self.assertEqual(web.ask(app, '/1').body, b'1 None 1')
+        response = web.ask(app, '/1')
+        self.assertEqual(response.body, b'1 None 1')
+        self.assertEqual(response.headers['X-Id'], '1')
+        # key depends on data and query
+        self.assertEqual(web.ask(app, '/2').body, b'2 None 2')
+        self.assertEqual(web.ask(app, '/1?page=2').body, b'1 2 3')
+        self.assertEqual(web.ask(app, '/1?page=2&b=3').body, b'1 2 3')
+        # other methods are not cached
+        self.assertEqual(web.ask(app, '/1', data={'a': '1'}).body,
+                         b'1 None 4')
+        self.assertEqual(len(self.calls), 4)
+
+    def test_not_cacheable(self):
+        app = self.app()
+        web.ask(app, '/cookie')
+        web.ask(app, '/cookie')
+        self.assertEqual(self.calls, [None, None])
+        # routing goes on if there is no response
+        self.assertEqual(web.ask(app, '/none').body, b'next')
+
+    def test_ttl(self):
+        app = self.app(ttl=0.05)
+        web.ask(app, '/1')
+        web.ask(app, '/1')
+        time.sleep(0.06)
+        self.assertEqual(web.ask(app, '/1').body, b'1 None 2')
+
+    def test_stale_while_revalidate(self):
+        started = threading.Event()
+        finish = threading.Event()
+
+        def slow(env, data):
+            self.calls.append(data.id)
+            if len(self.calls) > 1:
+                started.set()
+                finish.wait(5)
+            return Response(body=str(len(self.calls)).encode('utf-8'))
+        app = web.match('/<int:id>', 'item') | \
+                web.cache_response(self.storage, ttl=0.05, stale_ttl=10,
+                                   data=['id']) | slow
+        self.assertEqual(web.ask(app, '/1').body, b'1')
+        time.sleep(0.06)
+        responses = []
+        thread = threading.Thread(
+                target=lambda: responses.append(web.ask(app, '/1').body))
+        thread.start()
+        started.wait(5)
+        # regeneration is in progress, stale response is returned
+        self.assertEqual(web.ask(app, '/1').body, b'1')
+        finish.set()
+        thread.join()
+        self.assertEqual(responses, [b'2'])
+        self.assertEqual(web.ask(app, '/1').body, b'2')
+        self.assertEqual(len(self.calls), 2)
+
+    def test_stampede(self):
+        def slow(env, data):
+            self.calls.append(data.id)
+            time.sleep(0.05)
+            return Response(body=b'slow')
+        app = web.match('/<int:id>', 'item') | \
+                web.cache_response(self.storage, data=['id']) | slow
+        responses = []
+        threads = [threading.Thread(
+                        target=lambda: responses.append(web.ask(app, '/1')))
+                   for i in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([x.body for x in responses], [b'slow'] * 5)
+        self.assertEqual(self.calls, [1])
+
+
+class ConditionalTests(unittest.TestCase):
+
+    def setUp(self):
+        self.calls = []
+
+    def handler(self, env, data):
+        self.calls.append(data.id)
+        return Response(body=b'item')
+
+    def test_etag_callable(self):
+        app = web.match('/<int:id>', 'item') | \
+                web.conditional(etag=lambda e, d: 'v{}'.format(d.id)) | \
+                self.handler
+        response = web.ask(app, '/1')
+        self.assertEqual(response.headers['ETag'], '"v1"')
+        response = web.ask(app, '/1', headers={'If-None-Match': '"v1"'})
+        self.assertEqual(response.status_int, 304)
+        self.assertEqual(response.body, b'')
+        self.assertEqual(self.calls, [1])
+        response = web.ask(app, '/1', headers={'If-None-Match': '"v0"'})
+        self.assertEqual(response.status_int, 200)
+        # other methods are not conditional
+        response = web.ask(app, '/1', data={'a': '1'},
+                           headers={'If-None-Match': '"v1"'})
+        self.assertEqual(response.status_int, 200)
+
+    def test_last_modified(self):
+        modified = datetime.datetime(2020, 1, 1, 12)
+        app = web.match('/<int:id>', 'item') | \
+                web.conditional(last_modified=lambda e, d: modified) | \
+                self.handler
+        response = web.ask(app, '/1')
+        self.assertEqual(response.headers['Last-Modified'],
+                         'Wed, 01 Jan 2020 12:00:00 GMT')
+        response = web.ask(app, '/1', headers={
+                'If-Modified-Since': 'Wed, 01 Jan 2020 12:00:00 GMT'})
+        self.assertEqual(response.status_int, 304)
+        response = web.ask(app, '/1', headers={
+                'If-Modified-Since': 'Wed, 01 Jan 2020 11:00:00 GMT'})
+        self.assertEqual(response.status_int, 200)
+
+    def test_set_by_handler(self):
+        def handler(env, data):
+            if env.conditional.set(etag='v2'):
+                return env.conditional.response()
+            self.calls.append(data.id)
+            return Response(body=b'item')
+        app = web.match('/<int:id>', 'item') | web.conditional() | handler
+        self.assertEqual(web.ask(app, '/1').headers['ETag'], '"v2"')
+        response = web.ask(app, '/1', headers={'If-None-Match': '"v2"'})
+        self.assertEqual(response.status_int, 304)
+        self.assertEqual(self.calls, [1])
+
+    def test_body_hash(self):
+        app = web.match('/<int:id>', 'item') | web.conditional() | \
+                self.handler
+        etag = web.ask(app, '/1').headers['ETag']
+        self.assertEqual(etag, '"{}"'.format(
+                hashlib.md5(b'item').hexdigest()))
+        response = web.ask(app, '/1', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_int, 304)
+        # body is rendered anyway, the traffic is saved only
+        self.assertEqual(self.calls, [1, 1])
+
+    def test_streaming_not_hashed(self):
+        app = web.conditional() | \
+                (lambda e, d: Response(app_iter=iter([b'a', b'b'])))
+        response = web.ask(app, '/')
+        self.assertNotIn('ETag', response.headers)
+        self.assertEqual(response.body, b'ab')
+
+    def test_static_files(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        with open(os.path.join(root, 'a.css'), 'wb') as f:
+            f.write(b'body {}')
+        app = Application(web.conditional() |
+                          web.static_files(root, '/static/'))
+        response = Request.blank('/static/a.css').get_response(app)
+        self.assertEqual(response.status_int, 200)
+        self.assertEqual(response.body, b'body {}')
+        response = Request.blank('/static/a.css', headers={
+                'If-None-Match': response.headers['ETag']}).get_response(app)
+        self.assertEqual(response.status_int, 304)
@@ -219,7 +219,6 @@ class Chain(unittest.TestCase):
         chain = h
         self.assertEqual(chain(VS(), VS()), 1)
 
-    @unittest.expectedFailure
     def test_chain_reuse_copy_count(self):
         'Assert chaining does not cause too much copy calls'
         class CountHandler(web.WebHandler):
@@ -235,10 +234,48 @@ class Chain(unittest.TestCase):
                 assert isinstance(cp, CountHandler)
                 return cp
 
-        CountHandler(1) | CountHandler(2) | CountHandler(3)| CountHandler(4)| \
-            CountHandler(5)| CountHandler(6)| CountHandler(7)
+        chain = CountHandler(1) | CountHandler(2) | CountHandler(3) | \
+            CountHandler(4)| CountHandler(5)| CountHandler(6)| CountHandler(7)
 
-        self.assertEqual(CountHandler.copies, 7)
+        # only the first handler is copied on each chaining
+        self.assertEqual(CountHandler.copies, 6)
+
+        # the rest are copied once, on first access
+        handler = chain
+        for i in range(1, 7):
+            self.assertEqual(handler.i, i)
+            handler = handler.next_handler
+        self.assertEqual(handler.i, 7)
+        self.assertEqual(CountHandler.copies, 11)
+
+    def test_lazy_chain_shares_handlers(self):
+        'Chaining does not touch already chained handlers'
+        @F
+        def h(env, data, nx):
+            count = nx(env, data) or 0
+            return count + 1
+
+        inner = web.cases(h | h, h)
+        chain = h | inner
+        chain1 = chain | h
+        chain2 = chain1 | h
+
+        self.assertEqual(chain2(VS(), VS()), 5)
+        self.assertEqual(chain1(VS(), VS()), 4)
+        self.assertEqual(chain(VS(), VS()), 3)
+        self.assertEqual(inner(VS(), VS()), 2)
+        self.assert_(chain.next_handler is inner)
+        self.assert_(chain1.next_handler is not inner)
+        self.assertEqual(len(chain2.next_handler.handlers), 2)
+
+    def test_chain_after_function(self):
+        chain = F(lambda e, d, nx: nx(e, d)) | (lambda e, d: None)
+        self.assertRaises(TypeError, lambda: chain | HTTPNotFound)
+        # cases are chainable even if they contain functions
+        chain = F(lambda e, d, nx: nx(e, d)) | \
+                    web.cases(lambda e, d: None, F(lambda e, d, nx: None)) | \
+                    HTTPNotFound
+        self.assertEqual(chain(VS(), VS()), None)
 
     def test_chain_to_cases_with_functions(self):
         @F
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+
+__all__ = ['CompressTests']
+
+import os
+import gzip
+import shutil
+import datetime
+import tempfile
+import unittest
+from io import BytesIO
+from webob import Request, Response
+from iktomi import web
+from iktomi.web.app import Application
+
+BODY = b'<p>' + b'lorem ipsum ' * 200 + b'</p>'
+
+
+def gunzip(body):
+    return gzip.GzipFile(fileobj=BytesIO(body)).read()
+
+
+class CompressTests(unittest.TestCase):
+
+    def setUp(self):
+        self.calls = []
+
+    def app(self, **kwargs):
+        def stream(env, data):
+            self.calls.append('stream')
+            return Response(app_iter=iter([BODY[:100], BODY[100:]]),
+                            content_type='text/html')
+
+        def cacheable(env, data):
+            self.calls.append('cacheable')
+            response = Response(app_iter=iter([BODY]),
+                                content_type='text/html')
+            response.etag = 'v1'
+            return response
+        return web.compress(**kwargs) | web.cases(
+            web.match('/', 'index') | (lambda e, d: Response(BODY)),
+            web.match('/small', 'small') | (lambda e, d: Response(b'small')),
+            web.match('/image', 'image') | \
+                (lambda e, d: Response(BODY, content_type='image/png')),
+            web.match('/stream', 'stream') | stream,
+            web.match('/cacheable', 'cacheable') | cacheable,
+            web.match('/conditional', 'conditional') | \
+                web.conditional() | (lambda e, d: Response(BODY)),
+        )
+
+    def get(self, app, url, **headers):
+        headers.setdefault('Accept-Encoding', 'gzip, deflate')
+        return web.ask(app, url, headers=headers)
+
+    def test_compress(self):
+        response = self.get(self.app(), '/')
+        self.assertEqual(response.content_encoding, 'gzip')
+        self.assertIn('Accept-Encoding', response.vary)
+        self.assertEqual(response.content_length, len(response.body))
+        self.assertLess(response.content_length, len(BODY))
+        self.assertEqual(gunzip(response.body), BODY)
+
+    def test_not_compressed(self):
+        app = self.app()
+        response = web.ask(app, '/')
+        self.assertEqual(response.content_encoding, None)
+        self.assertIn('Accept-Encoding', response.vary)
+        self.assertEqual(response.body, BODY)
+        response = self.get(app, '/', **{'Accept-Encoding': 'gzip;q=0'})
+        self.assertEqual(response.content_encoding, None)
+        for url in ('/small', '/image'):
+            response = self.get(app, url)
+            self.assertEqual(response.content_encoding, None)
+            self.assertEqual(response.vary, None)
+        self.assertIsNone(self.get(app, '/missing'))
+
+    def test_stream(self):
+        response = self.get(self.app(), '/stream')
+        self.assertEqual(response.content_encoding, 'gzip')
+        self.assertEqual(response.content_length, None)
+        self.assertNotIsInstance(response.app_iter, list)
+        self.assertEqual(gunzip(b''.join(response.app_iter)), BODY)
+
+    def test_cache(self):
+        app = self.app()
+        first = self.get(app, '/cacheable')
+        self.assertEqual(first.etag, 'v1+gzip')
+        first = b''.join(first.app_iter)
+        second = self.get(app, '/cacheable')
+        self.assertEqual(second.app_iter, [first])
+        self.assertEqual(second.content_length, len(first))
+        self.assertEqual(gunzip(first), BODY)
+        # the handler is called, the compression is skipped
+        self.assertEqual(self.calls, ['cacheable', 'cacheable'])
+
+        app = self.app(cache_max_size=10)
+        b''.join(self.get(app, '/cacheable').app_iter)
+        self.assertNotIsInstance(self.get(app, '/cacheable').app_iter, list)
+
+    def test_conditional(self):
+        app = self.app()
+        response = self.get(app, '/conditional')
+        self.assertTrue(response.headers['ETag'].endswith('+gzip"'))
+        response = self.get(app, '/conditional',
+                            **{'If-None-Match': response.headers['ETag']})
+        self.assertEqual(response.status_int, 304)
+        self.assertTrue(response.headers['ETag'].endswith('+gzip"'))
+
+    def test_restores_if_none_match(self):
+        seen = []
+
+        def handler(env, data):
+            seen.append(env.request.environ['HTTP_IF_NONE_MATCH'])
+            raise ValueError
+        app = web.compress() | handler
+        with self.assertRaises(ValueError):
+            self.get(app, '/', **{'If-None-Match': '"v1+gzip"'})
+        self.assertEqual(seen, ['"v1"'])
+
+    def test_if_modified_since(self):
+        modified = datetime.datetime(2020, 1, 1, 12)
+        app = web.compress() | web.match('/p', 'p') | \
+                web.conditional(etag=lambda e, d: 'v1',
+                                last_modified=lambda e, d: modified) | \
+                (lambda e, d: Response(BODY))
+        response = self.get(app, '/p', **{
+                'If-Modified-Since': 'Wed, 01 Jan 2020 12:00:00 GMT'})
+        self.assertEqual(response.status_int, 304)
+        self.assertEqual(response.headers['ETag'], '"v1"')
+
+    def test_static_files(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        with open(os.path.join(root, 'a.css'), 'wb') as f:
+            f.write(BODY)
+        with gzip.open(os.path.join(root, 'a.css.gz'), 'wb') as f:
+            f.write(BODY)
+        static = web.static_files(root, '/static/', precompressed=True)
+        app = web.compress() | web.cases(
+            static,
+            web.match('/', 'index') | (lambda e, d: Response(BODY)),
+        )
+        request = Request.blank('/static/a.css',
+                                headers={'Accept-Encoding': 'gzip'})
+        response = request.get_response(Application(app))
+        self.assertEqual(response.status_int, 200)
+        self.assertEqual(response.content_encoding, 'gzip')
+        self.assertEqual(gunzip(response.body), BODY)
+        # ETag of precompressed file is passed to static_files as is
+        request = Request.blank('/static/a.css', headers={
+                'Accept-Encoding': 'gzip',
+                'If-None-Match': response.headers['ETag']})
+        response = request.get_response(Application(app))
+        self.assertEqual(response.status_int, 304)
@@ -105,3 +105,63 @@ class AnyConverter(unittest.TestCase):
     #    self.assertRaises(ConverterError,
     #                      Any('option1', 'option2').to_url,
     #                      'nooption')
+
+
+class CompiledConverter(unittest.TestCase):
+
+    def test_builtin(self):
+        self.assertEqual(Integer()._compile()('42'), 42)
+        self.assertEqual(String()._compile()('a%20b'), u'a b')
+        self.assertEqual(String()._compile()(u'%D1%8F'), u'я')
+        self.assertRaises(ConvertError, String(max=2)._compile(), 'abc')
+        convert = Any('a', 'b c')._compile()
+        self.assertEqual(convert('b%20c'), 'b c')
+        self.assertRaises(ConvertError, convert, 'c')
+        self.assertEqual(Date()._compile()('2015-01-02'), date(2015, 1, 2))
+
+    def test_overridden_to_python(self):
+        class Upper(String):
+            def to_python(self, value, env=None):
+                return value.upper()
+
+        class Odd(Integer):
+            def to_python(self, value, env=None):
+                value = Integer.to_python(self, value)
+                if not value % 2:
+                    raise ConvertError(self, value)
+                return value
+
+        self.assertEqual(Upper()._compile()('abc'), 'ABC')
+        self.assertEqual(Odd()._compile()('3'), 3)
+        self.assertRaises(ConvertError, Odd()._compile(), '2')
+
+    def test_pure(self):
+        calls = []
+
+        class Lower(Converter):
+            pure = True
+            pure_cache_size = 2
+
+            def to_python(self, value, env=None):
+                calls.append(value)
+                if not value:
+                    raise ConvertError(self, value)
+                return value.lower()
+
+        convert = Lower()._compile()
+        self.assertEqual(convert('A'), 'a')
+        self.assertEqual(convert('A', env=None), 'a')
+        self.assertEqual(calls, ['A'])
+        convert('B')
+        convert('C')
+        self.assertEqual(len(convert.cache), 2)
+        convert('A')
+        self.assertEqual(calls, ['A', 'B', 'C', 'A'])
+        self.assertRaises(ConvertError, convert, '')
+        self.assert_('' not in convert.cache)
+
+    def test_template(self):
+        template = UrlTemplate('/<int:id>/<any(x,y):kind>/<name>')
+        self.assertEqual(template.match('/1/y/a%2Fb'),
+                         ('/1/y/a%2Fb', {'id': 1, 'kind': 'y', 'name': 'a/b'}))
+        self.assertEqual(template.match('/1/z/a'), (None, {}))
@@ -4,9 +4,12 @@ __all__ = ['Prefix', 'Match', 'Subdomain']
 
 import unittest
 import tempfile, shutil
+import gzip
 import os
 from iktomi import web
 from iktomi.web.app import Application
+from iktomi.web.static import StaticManifest
+from iktomi.utils.storage import VersionedStorage
 from webtest import TestApp as TA
 from webob import Response
 
@@ -358,6 +361,39 @@ class Method(unittest.TestCase):
         self.assertEqual(web.ask(app, '/', method="DELETE").body, b'delete')
         self.assertEqual(web.ask(app, '/').body, b'default')
 
+    def test_by_method_dispatch(self):
+        pushes = []
+
+        class Storage(VersionedStorage):
+            def _push(self, **kwargs):
+                pushes.append(1)
+                return VersionedStorage._push(self, **kwargs)
+
+        app = web.by_method(dict(
+            [(name, (lambda name: lambda e, d: Response(name))(name))
+             for name in ('GET', 'POST', 'PUT', 'PATCH')] +
+            [('DELETE', lambda e, d: None)]),
+            default_handler=lambda e, d: Response('default'))
+        self.assertEqual(web.ask(app, '/', method='PATCH',
+                                 storage_class=Storage).body, b'PATCH')
+        # env and data frames are pushed for the chosen branch only
+        self.assertEqual(len(pushes), 2)
+        self.assertEqual(web.ask(app, '/', method='HEAD').body, b'GET')
+        # default handler is called if the branch returns None
+        self.assertEqual(web.ask(app, '/', method='DELETE').body, b'default')
+        self.assertEqual(web.ask(app, '/', method='OPTIONS').body,
+                         b'default')
+
+    def test_by_method_locations(self):
+        app = web.by_method({
+            'GET': web.match('/', 'get'),
+            ('POST', 'PUT'): web.match('/post', 'post'),
+        }) | (lambda e, d: Response('chained'))
+        self.assertEqual(sorted(app._locations()), ['get', 'post'])
+        self.assertEqual(web.ask(app, '/post', method='PUT').body,
+                         b'chained')
+        self.assertEqual(web.ask(app, '/post', method='GET').status_int, 405)
+
 
 class Namespace(unittest.TestCase):
 
@@ -449,3 +485,126 @@ class Static(unittest.TestCase):
         app.get('/media/x', status=404)
         app.get('/media/x/', status=404)
 
+
+    def write(self, name, content, mtime=None):
+        file_path = os.path.join(self.root, name)
+        with open(file_path, 'wb') as f:
+            f.write(content)
+        if mtime is not None:
+            os.utime(file_path, (mtime, mtime))
+
+    def test_conditional(self):
+        self.write('x.css', b'body {}', mtime=1000000000)
+        app = TA(Application(web.static_files(self.root, self.url,
+                                              cache_max_age=3600)))
+        response = app.get('/media/x.css')
+        self.assertEqual(response.body, b'body {}')
+        self.assertEqual(response.headers['Cache-Control'],
+                         'public, max-age=3600')
+        self.assertEqual(response.headers['Last-Modified'],
+                         'Sun, 09 Sep 2001 01:46:40 GMT')
+        etag = response.headers['ETag']
+        response = app.get('/media/x.css', headers={'If-None-Match': etag},
+                           status=304)
+        self.assertEqual(response.body, b'')
+        self.assertEqual(response.headers['ETag'], etag)
+        app.get('/media/x.css', headers={'If-None-Match': '"other"'},
+                status=200)
+        app.get('/media/x.css', status=304, headers={
+                    'If-Modified-Since': 'Sun, 09 Sep 2001 01:46:40 GMT'})
+        app.get('/media/x.css', status=200, headers={
+                    'If-Modified-Since': 'Sun, 09 Sep 2001 01:46:39 GMT'})
+        self.assertEqual(app.head('/media/x.css').headers['Content-Length'],
+                         '7')
+
+    def test_range(self):
+        self.write('x.txt', b'0123456789')
+        app = TA(Application(web.static_files(self.root, self.url)))
+        response = app.get('/media/x.txt', headers={'Range': 'bytes=2-4'},
+                           status=206)
+        self.assertEqual(response.body, b'234')
+        self.assertEqual(response.headers['Content-Range'], 'bytes 2-4/10')
+        response = app.get('/media/x.txt', headers={'Range': 'bytes=-3'},
+                           status=206)
+        self.assertEqual(response.body, b'789')
+        app.get('/media/x.txt', headers={'Range': 'bytes=20-'}, status=416)
+        # If-Range does not match, the whole file is sent
+        response = app.get('/media/x.txt', status=200, headers={
+                                'Range': 'bytes=2-4', 'If-Range': '"old"'})
+        self.assertEqual(response.body, b'0123456789')
+        etag = response.headers['ETag']
+        app.get('/media/x.txt', status=206, headers={
+                    'Range': 'bytes=2-4', 'If-Range': etag})
+
+    def test_precompressed(self):
+        self.write('x.js', b'plain', mtime=1000000000)
+        self.write('x.js.gz', gzip.compress(b'gzipped'), mtime=1000000000)
+        self.write('x.js.br', b'brotli', mtime=999999999)
+        app = TA(Application(web.static_files(self.root, self.url,
+                                              precompressed=True)))
+        response = app.get('/media/x.js',
+                           headers={'Accept-Encoding': 'gzip, br'})
+        # outdated .br sibling is ignored, webtest decodes gzip
+        self.assertTrue(response.headers['ETag'].endswith('-gzip"'))
+        self.assertEqual(response.headers['Vary'], 'Accept-Encoding')
+        self.assertEqual(response.body, b'gzipped')
+        response = app.get('/media/x.js',
+                           headers={'Accept-Encoding': 'gzip;q=0'})
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertEqual(response.body, b'plain')
+        # precompressed files are not used by default
+        app = TA(Application(web.static_files(self.root, self.url)))
+        response = app.get('/media/x.js', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.body, b'plain')
+
+    def test_file_wrapper(self):
+        self.write('x.txt', b'x')
+        wrapped = []
+
+        def file_wrapper(f, block_size):
+            wrapped.append(f)
+            return iter([f.read()])
+        app = TA(Application(web.static_files(self.root, self.url)),
+                 extra_environ={'wsgi.file_wrapper': file_wrapper})
+        self.assertEqual(app.get('/media/x.txt').body, b'x')
+        self.assertEqual(len(wrapped), 1)
+
+    def test_stat_cache(self):
+        static = web.static_files(self.root, self.url, stat_ttl=None)
+        app = TA(Application(static))
+        app.get('/media/x.txt', status=404)
+        self.write('x.txt', b'x')
+        # missing file is cached
+        app.get('/media/x.txt', status=404)
+        static.index.invalidate(os.path.join(self.root, 'x.txt'))
+        self.assertEqual(app.get('/media/x.txt').body, b'x')
+        os.unlink(os.path.join(self.root, 'x.txt'))
+        # the file is removed after stat call
+        app.get('/media/x.txt', status=404)
+        app.get('/media/x.txt', status=404)
+        app.post('/media/x.txt', status=404)
+
+    def test_manifest(self):
+        self.write('x.css', b'body {}')
+        os.mkdir(os.path.join(self.root, 'js'))
+        self.write('js/y.js', b'alert(1)')
+        manifest_path = os.path.join(self.xroot, 'manifest.json')
+        StaticManifest.build(self.root).dump(manifest_path)
+
+        for manifest in (True, manifest_path):
+            static = web.static_files(self.root, self.url, manifest=manifest)
+            app = TA(Application(static))
+            url = static.url_for_static('/x.css')
+            self.assertRegexpMatches(url, r'^/media/x\.[0-9a-f]{12}\.css$')
+            self.assertRegexpMatches(static.url_for_static('js/y.js'),
+                                     r'^/media/js/y\.[0-9a-f]{12}\.js$')
+            self.assertEqual(static.url_for_static('missing.css'),
+                             '/media/missing.css')
+            response = app.get(url)
+            self.assertEqual(response.body, b'body {}')
+            self.assertEqual(response.headers['Cache-Control'],
+                             'public, max-age=31536000, immutable')
+            # plain url is still served
+            response = app.get('/media/x.css')
+            self.assertNotIn('Cache-Control', response.headers)
+            app.get('/media/x.000000000000.css', status=404)
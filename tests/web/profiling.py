@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+
+__all__ = ['ProfilerTests']
+
+import unittest
+from webob import Response
+from webtest import TestApp as TA
+from iktomi import web
+from iktomi.web.app import Application
+from iktomi.web.profiling import Profiler, Histogram
+from iktomi.utils.storage import FlatVersionedStorage
+
+
+class ProfilerTests(unittest.TestCase):
+
+    def app(self):
+        return web.cases(
+            web.match('/', 'index') | (lambda e, d: Response(body=b'index')),
+            web.prefix('/docs', name='docs') | web.cases(
+                web.match('', 'index') | (lambda e, d: Response()),
+                web.match('/<int:id>', 'item') | (lambda e, d: Response()),
+            ),
+        )
+
+    def profiled(self, **kwargs):
+        exported = []
+        profiler = Profiler(sink=exported.append, flush_interval=None)
+        app = TA(Application(self.app(), profiler=profiler, **kwargs))
+        return app, profiler, exported
+
+    def test_histograms(self):
+        app, profiler, exported = self.profiled()
+        self.assertEqual(app.get('/').body, b'index')
+        app.get('/docs/1')
+        app.get('/docs/1')
+        app.get('/missing', status=404)
+        profiler.flush()
+        self.assertEqual(len(exported), 1)
+        histograms = exported[0]
+        self.assertEqual(set(histograms), set(['index', 'docs.item', None]))
+        item = histograms['docs.item']
+        self.assertEqual(item['time'].count, 2)
+        # root cases tries index and docs, nested one tries index and item
+        self.assertEqual(item['branches'].sum, 8)
+        self.assertEqual(item['push'].sum, 16)
+        self.assertEqual(item['pop'].sum, 16)
+        self.assertEqual(item["handler:match('/<int:id>', 'item')"].count, 2)
+        self.assertEqual(item['handler:cases(..)'].count, 2)
+        self.assertEqual(histograms[None]['branches'].max, 2)
+        # histograms are reset
+        profiler.flush()
+        self.assertEqual(len(exported), 1)
+
+    def test_compiled_flat_storage(self):
+        app, profiler, exported = self.profiled(
+                compile_routes=True, storage_class=FlatVersionedStorage)
+        app.get('/docs/1')
+        profiler.flush()
+        item = exported[0]['docs.item']
+        # '/' is a prefix of the path, the nested match is prematched
+        self.assertEqual(item['branches'].sum, 3)
+        self.assertEqual(item['push'].sum, 6)
+
+    def test_adaptive(self):
+        handler = web.cases(*[
+            web.match('/r{}'.format(i), 'r{}'.format(i)) |
+                (lambda e, d: Response())
+            for i in range(10)], adaptive=True)
+        profiler = Profiler(sink=[].append, flush_interval=None)
+        app = TA(Application(handler, profiler=profiler))
+        handler.stats.reorder_every = 10
+        for i in range(10):
+            app.get('/r9')
+        self.assertEqual(handler.stats.runs, [(0, 10)])
+        self.assertEqual(handler.stats.order[:2], [9, 0])
+
+    def test_compiled_subdomains(self):
+        nested = web.cases(
+            web.subdomain('a') | (lambda e, d: Response(body=b'a')),
+            web.subdomain('b') | (lambda e, d: Response(body=b'b')),
+        )
+        profiler = Profiler(sink=[].append, flush_interval=None)
+        app = TA(Application(web.subdomain('example.com') | nested,
+                             profiler=profiler, compile_routes=True))
+        self.assertEqual(app.get('/', extra_environ={
+                'HTTP_HOST': 'b.example.com'}).body, b'b')
+        self.assertEqual(len(nested._router.subdomain_groups), 2)
+
+    def test_flush_interval(self):
+        exported = []
+        profiler = Profiler(sink=exported.append, flush_interval=0)
+        app = TA(Application(self.app(), profiler=profiler))
+        app.get('/')
+        app.get('/')
+        self.assertEqual([x['index']['time'].count for x in exported],
+                         [1, 1])
+
+    def test_disabled(self):
+        # the tree is not changed without profiler
+        handler = self.app()
+        Application(handler)
+        self.assertIs(type(handler), web.cases)
+        self.assertEqual(web.ask(handler, '/docs/1').status_int, 200)
+
+    def test_histogram(self):
+        histogram = Histogram((1, 10))
+        for value in (0, 1, 5, 20):
+            histogram.add(value)
+        self.assertEqual(histogram.counts, [2, 1, 1])
+        self.assertEqual(histogram.mean, 6.5)
+        self.assertEqual(histogram.max, 20)
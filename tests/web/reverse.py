@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 
-__all__ = ['ReverseTests', 'LocationsTests']
+__all__ = ['ReverseTests', 'LocationsTests', 'EndpointBuilderTests']
 
 import unittest
 from webob import Response
@@ -142,6 +142,50 @@ class LocationsTests(unittest.TestCase):
 
 class ReverseTests(unittest.TestCase):
 
+    def test_interned(self):
+        'Argument-free unbound subreverses are shared'
+        app = web.subdomain('example.com') | web.cases(
+            web.prefix('/news', name='news') | web.cases(
+                web.match('', ''),
+                web.match('/index', 'index'),
+                web.match('/<int:id>', 'item')),
+            web.subdomain('en') | web.prefix('/docs', name='docs') | \
+                web.match('/', 'index', fragment='top'))
+        r = web.Reverse.from_handler(app)
+        self.assert_(r.news.index is r.news.index)
+        self.assert_(r.news is r.build_subreverse('news'))
+        self.assertEqual(r.docs.index.as_url, 'http://en.example.com/docs/#top')
+        self.assertEqual(sorted(r._interned),
+                         ['docs', 'docs.index', 'news', 'news.index'])
+        # subreverses with arguments are not interned
+        self.assert_(r.news.item(id=1) is not r.news.item(id=1))
+        self.assertEqual(r.news.item(id=1).as_url,
+                         'http://example.com/news/1')
+        self.assertEqual(r.news.as_url, 'http://example.com/news')
+
+        results = []
+
+        def handler(env, data):
+            # reverse without interning
+            plain = web.Reverse(env.root._scope).bind_to_env(env)
+            for name in ('news', 'news.index', 'docs.index'):
+                self.assertEqual(str(env.root.build_subreverse(name)),
+                                 str(plain.build_subreverse(name)))
+            results.append(env.root.news.index)
+            return Response()
+        wsgi_app = web.Application(web.cases(
+            web.subdomain('example.com') | web.match('/', 'x') | handler,
+            app))
+        for host in ('example.com', 'en.example.com'):
+            web.Request.blank('/', headers={'Host': host})\
+                    .get_response(wsgi_app)
+        # bound views share the state of interned reverse
+        first, second = results
+        self.assert_(first is not second)
+        self.assert_(first._bound_env is not second._bound_env)
+        self.assert_(first._scope is wsgi_app.root.news.index._scope)
+        self.assertEqual(wsgi_app.root.news.index._bound_env, None)
+
     def test_one_handler(self):
         'Reverse one match'
         r = web.Reverse.from_handler(web.match('/', 'index'))
@@ -566,3 +610,173 @@ class ReverseTests(unittest.TestCase):
         self.assertEqual(r.page(page=1).as_url, '/x/#page1')
         self.assertEqual(r.z.as_url, '/x/z#z')
 
+
+class EndpointBuilderTests(unittest.TestCase):
+
+    def app(self, *handlers):
+        return web.subdomain('example.com') | web.cases(
+            web.match('/', 'index', fragment='top'),
+            web.prefix('/news/<section>', name='news') | web.cases(
+                web.match('', ''),
+                web.match('/<int:id>', 'item'),
+                web.match('/<int:id>#', 'anchor', fragment='c<int:comment>'),
+                web.prefix('/<int(default=1):page>', name='page') | \
+                        web.cases(web.match('/list', ''))),
+            web.subdomain('en') | web.prefix('/docs', name='docs') | \
+                    web.cases(
+                        web.match(u'/раздел', 'unicode'),
+                        web.subdomain('api') | \
+                                web.match('/<path>', 'path')),
+            web.namespace('persons') | web.prefix('/<int:person_id>') | \
+                    web.cases(
+                        web.match('/index/<page>', ''),
+                        web.match('/<int:news_id>', 'item')),
+            *handlers)
+
+    cases = [
+        ('index', {}),
+        ('news', {'section': 'top'}),
+        ('news.item', {'section': 'top', 'id': 1}),
+        ('news.anchor', {'section': 'top', 'id': 1, 'comment': 2}),
+        ('news.page', {'section': 'top'}),
+        ('news.page', {'section': 'top', 'page': 3}),
+        ('docs.unicode', {}),
+        ('docs.path', {'path': u'a b/c'}),
+        ('persons', {'person_id': 1, 'page': 2}),
+        ('persons.item', {'person_id': 1, 'news_id': 2}),
+    ]
+
+    errors = [
+        ('news', {}),
+        ('news', {'section': 'top', 'id': 1}),
+        ('news.item', {'section': 'top'}),
+        ('news.anchor', {'section': 'top', 'id': 1}),
+        ('news.missing', {'section': 'top'}),
+        ('docs', {}),
+        ('as_url', {}),
+    ]
+
+    def assertSameUrl(self, url, expected):
+        self.assertEqual(url, expected)
+        self.assertEqual((url.path, url.host, url.port, url.scheme,
+                          url.fragment, url.show_host),
+                         (expected.path, expected.host, expected.port,
+                          expected.scheme, expected.fragment,
+                          expected.show_host))
+
+    def test_same_urls(self):
+        r = web.Reverse.from_handler(self.app())
+        # reverse without builders cache uses regular way
+        plain = web.Reverse(r._scope)
+        for name, kwargs in self.cases:
+            self.assertSameUrl(r.build_url(name, **kwargs),
+                               plain.build_url(name, **kwargs))
+        for name, kwargs in self.errors:
+            self.assertRaises(UrlBuildingError, r.build_url, name, **kwargs)
+            self.assertRaises(UrlBuildingError, plain.build_url, name,
+                              **kwargs)
+        self.assertEqual(r.build_url('news.page', section='top'),
+                         'http://example.com/news/top/1/list')
+        self.assert_(r._builders['news.page'] is not None)
+        self.assertEqual(plain._builders, None)
+
+    def test_ready_namespace_with_default_endpoint(self):
+        app = web.prefix('/a/<int:p>', name='a') | web.cases(
+            web.match('/<int:z>', ''),
+            web.prefix('/b/<int:p>', name='b') | web.namespace('a') | \
+                    web.match('/<int:z>', ''))
+        r = web.Reverse.from_handler(app)
+        plain = web.Reverse(r._scope)
+        # the ready 'a' namespace is not called, its default endpoint is
+        # built without arguments
+        for root in (r, plain):
+            self.assertRaises(UrlBuildingError, root.build_url, 'a.b.a',
+                              p=2, z=3)
+        self.assertEqual(r._builders['a.b.a'], None)
+        self.assertEqual(r.build_url('a', p=2, z=3), '/a/2/3')
+
+    def test_same_subreverses(self):
+        r = web.Reverse.from_handler(self.app())
+        plain = web.Reverse(r._scope)
+        for name, kwargs in self.cases + [('news.page', {'section': 'top',
+                                                         'page': 2}),
+                                          ('docs', {})]:
+            indexed = r.build_subreverse(name, **kwargs)
+            expected = plain.build_subreverse(name, **kwargs)
+            for attr in ('_path', '_host', '_fragment', '_ready',
+                         '_finalize_params', '_callable', '_location',
+                         '_need_arguments', '_is_endpoint'):
+                self.assertEqual(getattr(indexed, attr),
+                                 getattr(expected, attr), (name, attr))
+            self.assert_(indexed._scope is expected._scope)
+            if expected._is_endpoint:
+                self.assertSameUrl(indexed.as_url, expected.as_url)
+        # the namespace waiting for arguments is built by traversal
+        self.assertEqual(r.build_subreverse('persons', person_id=1)\
+                                .item(news_id=2).as_url,
+                         'http://example.com/1/2')
+        self.assertEqual(r.build_subreverse('news', section='a').page.as_url,
+                         'http://example.com/news/a/1/list')
+        for name, kwargs in self.errors[:-1]:
+            self.assertRaises(UrlBuildingError, r.build_url, name, **kwargs)
+
+    def test_has_endpoint(self):
+        r = web.Reverse.from_handler(self.app())
+        for root in (r, web.Reverse(r._scope)):
+            for name in ('index', 'news', 'news.item', 'news.page',
+                         'docs.path', 'persons.item'):
+                self.assertTrue(root.has_endpoint(name), name)
+            for name in ('docs', 'missing', 'news.missing', 'news.',
+                         'index.item', ''):
+                self.assertFalse(root.has_endpoint(name), name)
+        self.assertTrue(r.news.has_endpoint('item'))
+        # arguments of the called 'persons' reverse include the arguments
+        # of its default endpoint
+        self.assertEqual(sorted(r._index.get('persons.item').url_arguments),
+                         ['news_id', 'page', 'person_id'])
+        self.assertEqual(r._index.get('news.page').need_arguments,
+                         (True, True))
+
+    def test_build_urls(self):
+        r = web.Reverse.from_handler(self.app())
+        plain = web.Reverse(r._scope)
+        items = [{'id': i} for i in range(3)]
+        urls = r.build_urls('news.item', items, section='top')
+        self.assertEqual(next(urls), 'http://example.com/news/top/0')
+        self.assertEqual(list(urls), ['http://example.com/news/top/1',
+                                      'http://example.com/news/top/2'])
+        for name, kwargs in self.cases:
+            self.assertSameUrl(list(r.build_urls(name, [kwargs]))[0],
+                               plain.build_url(name, **kwargs))
+            self.assertSameUrl(list(plain.build_urls(name, [{}], **kwargs))[0],
+                               plain.build_url(name, **kwargs))
+            strings = list(r.build_urls(name, [kwargs], _strings=True))
+            self.assertEqual(strings, [str(plain.build_url(name, **kwargs))])
+            self.assertEqual(type(strings[0]), str)
+        for name, kwargs in self.errors:
+            self.assertRaises(UrlBuildingError, list,
+                              r.build_urls(name, [kwargs]))
+
+    def test_same_urls_bound(self):
+        results = []
+
+        def handler(env, data):
+            plain = web.Reverse(env.root._scope).bind_to_env(env)
+            for name, kwargs in self.cases:
+                url = env.root.build_url(name, **kwargs)
+                self.assertSameUrl(url, plain.build_url(name, **kwargs))
+                self.assertEqual(
+                    list(env.root.build_urls(name, [kwargs], _strings=True)),
+                    [str(url)])
+                results.append(url)
+            return Response()
+
+        app = self.app(handler)
+        web.ask(app, 'http://example.com/')
+        self.assertEqual(results[0], '/#top')
+        self.assertEqual(results[7], 'http://api.en.example.com/docs/a%20b/c')
+        del results[:]
+        web.ask(app, 'https://example.com:8000/')
+        self.assertEqual(results[0], '/#top')
+        self.assertEqual(results[6], 'https://en.example.com:8000/docs/'
+                                     '%D1%80%D0%B0%D0%B7%D0%B4%D0%B5%D0%BB')
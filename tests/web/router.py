@@ -0,0 +1,337 @@
+# -*- coding: utf-8 -*-
+
+__all__ = ['PathTrieTests', 'CompiledRoutingTests', 'MatchGroupTests',
+           'SubdomainGroupTests', 'AdaptiveCasesTests']
+
+import unittest
+from webob import Response
+from webob.exc import HTTPMethodNotAllowed
+from iktomi import web
+from iktomi.web.app import Application
+from iktomi.web.router import PathTrie, find_match_groups, \
+        find_static_runs, find_subdomain_groups
+
+
+class PathTrieTests(unittest.TestCase):
+
+    def test_lookup(self):
+        trie = PathTrie()
+        for index, prefix in enumerate(['/news', '/news/', '', '/', '/docs/a',
+                                        '/newsletter']):
+            trie.add(prefix, index)
+        self.assertEqual(trie.lookup('/news'), [0, 2, 3])
+        self.assertEqual(trie.lookup('/news/1'), [0, 1, 2, 3])
+        self.assertEqual(trie.lookup('/newsletter/'), [0, 2, 3, 5])
+        self.assertEqual(trie.lookup('/docs/abc'), [2, 3, 4])
+        self.assertEqual(trie.lookup('/docs'), [2, 3])
+        self.assertEqual(trie.lookup(''), [2])
+
+
+class CompiledRoutingTests(unittest.TestCase):
+
+    def assertSameRouting(self, make_app, urls, **kwargs):
+        plain = make_app()
+        compiled = Application(make_app(), compile_routes=True)
+        for url in urls:
+            expected = self._ask(plain, url, **kwargs)
+            self.assertEqual(self._ask(compiled, url, **kwargs), expected,
+                             url)
+
+    def _ask(self, app, url, **kwargs):
+        try:
+            response = web.ask(app, url, **kwargs)
+        except HTTPMethodNotAllowed:
+            return 405
+        if response is None:
+            return None
+        return response.body
+
+    def test_prefixes(self):
+        def h(text):
+            return lambda e, d: Response(text + ' ' + repr(d.as_dict()))
+
+        def make_app():
+            return web.cases(
+                web.match('/', 'index') | h('index'),
+                web.prefix('/news', name='news') | web.cases(
+                    web.match('', 'index') | h('news'),
+                    web.match('/<int:id>', 'item') | h('news item'),
+                    web.prefix('/tags') | web.cases(
+                        web.match('/<tag>', 'tag') | h('tag'))),
+                web.match('/newsletter', 'newsletter') | h('newsletter'),
+                web.prefix('/<any(a,b):section>') | web.cases(
+                    web.match('/list', 'list') | h('section list')),
+                web.match(u'/раздел', 'unicode') | h('unicode'),
+                web.match('/news/1', 'shadowed') | h('shadowed'))
+        encoded = '/%D1%80%D0%B0%D0%B7%D0%B4%D0%B5%D0%BB'
+
+        self.assertSameRouting(make_app, [
+            '/', '', '/news', '/news/', '/news/1', '/news/x', '/news/tags/a',
+            '/newsletter', '/newsletter/', '/a/list', '/c/list', '/unknown',
+            encoded, '/news/1/'])
+
+        app = Application(make_app(), compile_routes=True)
+        self.assertEqual(web.ask(app, '/news/1').body,
+                         b"news item {'id': 1}")
+        self.assertEqual(web.ask(app, encoded).body, b'unicode {}')
+
+    def test_guards(self):
+        'None from guards means continue in compiled routing too'
+        def make_app():
+            return web.cases(
+                web.match('/item', 'item') | web.method('POST') | \
+                        (lambda e, d: Response('post')),
+                web.subdomain('sub') | web.match('/item', 'sub_item') | \
+                        (lambda e, d: Response('sub')),
+                web.match('/item', 'item_get') | web.method('GET') | \
+                        (lambda e, d: Response('get')),
+                web.method('PUT', strict=True) | \
+                        web.match('/put', 'put') | \
+                        (lambda e, d: Response('put')),
+                web.match('/other', 'other') | (lambda e, d: Response('other')))
+
+        urls = ['/item', 'http://sub.example.com/item', '/other', '/put']
+        self.assertSameRouting(make_app, urls)
+        self.assertSameRouting(make_app, urls, method='POST')
+        self.assertSameRouting(make_app, urls, method='PUT')
+
+    def test_custom_filters_are_always_called(self):
+        calls = []
+
+        @web.request_filter
+        def log(env, data, next_handler):
+            calls.append(env._route_state.path)
+            return next_handler(env, data)
+
+        app = web.cases(
+            web.match('/a', 'a') | (lambda e, d: Response('a')),
+            log | web.match('/b', 'b') | (lambda e, d: Response('b')),
+            web.match('/c', 'c') | (lambda e, d: Response('c')))
+        app = Application(app, compile_routes=True)
+        self.assertEqual(web.ask(app, '/c').body, b'c')
+        self.assertEqual(calls, ['/c'])
+
+    def test_subclasses_are_always_called(self):
+        class imatch(web.match):
+            def match(self, env, data):
+                path = env._route_state.path.lower()
+                matched, kwargs = self.builder.match(path, env=env)
+                return self._handle_matched(env, data, matched, kwargs)
+            __call__ = match
+
+        class iprefix(web.prefix):
+            def prefix(self, env, data):
+                path = env._route_state.path
+                if path.lower().startswith(self.url):
+                    env._route_state = env._route_state.add_prefix(
+                            path[:len(self.url)])
+                    return self.next_handler(env, data)
+            __call__ = prefix
+
+        def make_app():
+            return web.cases(
+                web.match('/', 'index') | (lambda e, d: Response('index')),
+                imatch('/about', 'about') | (lambda e, d: Response('about')),
+                iprefix('/docs') | web.match('/a', 'a') | \
+                        (lambda e, d: Response('docs')),
+                web.match('/other', 'other') | \
+                        (lambda e, d: Response('other')))
+        self.assertSameRouting(make_app, ['/ABOUT', '/about', '/DOCS/a',
+                                          '/other'])
+        app = Application(make_app(), compile_routes=True)
+        self.assertEqual(web.ask(app, '/ABOUT').body, b'about')
+        self.assertEqual(web.ask(app, '/DOCS/a').body, b'docs')
+
+    def test_router_is_used(self):
+        called = []
+
+        def handler(name):
+            def h(env, data):
+                called.append(name)
+            return h
+
+        app = web.cases(*[web.match('/{}'.format(i), str(i)) | handler(i)
+                          for i in range(10)])
+        Application(app, compile_routes=True)
+        self.assertEqual(app._route_prefix(), '/')
+        web.ask(app, '/5')
+        # handlers return None, but only matching branch is called
+        self.assertEqual(called, [5])
+
+    def test_chaining_resets_router(self):
+        app = web.cases(web.match('/a', 'a'), web.match('/b', 'b'))
+        app._compile()
+        self.assertTrue(app._router is not None)
+        chained = app | (lambda e, d: Response('ok'))
+        self.assertEqual(chained._router, None)
+        self.assertEqual(web.ask(chained, '/b').body, b'ok')
+
+    def test_no_static_prefixes(self):
+        app = web.cases(web.match('<a>', 'a'), web.prefix('<b>/x'))
+        app._compile()
+        self.assertEqual(app._router, None)
+
+
+class MatchGroupTests(unittest.TestCase):
+
+    def test_find_match_groups(self):
+        m = web.match
+        handlers = [m('/a'), m('/b/<c>'), m('/c') | m('/d'),
+                    web.prefix('/e'), m('/f'),
+                    web.prefix('/g'), m('/h'), m('/i'), m('/j')]
+        self.assertEqual(find_match_groups(handlers), [(0, 3), (6, 9)])
+        # number of regexp groups is limited
+        self.assertEqual(find_match_groups(handlers, max_groups=3),
+                         [(0, 2), (6, 9)])
+
+    def test_group_is_used(self):
+        app = web.cases(*[web.match('/<int:id>/x{0}'.format(i),
+                                    str(i)) |
+                          (lambda e, d: Response(str(d.id)))
+                          for i in range(20)])
+        app._compile()
+        self.assertEqual(app._router.trie, None)
+        self.assertEqual(len(app._router.match_groups), 20)
+        env = web.AppEnvironment.create(web.Request.blank('/3/x15'),
+                                        web.Reverse.from_handler(app))
+        routed = app._router.route(env)
+        # preceding branches are skipped
+        self.assertEqual(len(routed), 5)
+        self.assertEqual(routed[0].args, ('/3/x15', {'id': '3'}))
+        self.assertEqual(web.ask(app, '/3/x15').body, b'3')
+
+    def test_fallback(self):
+        'Branches after matched one are tried if it returns None'
+        def make_app():
+            return web.cases(
+                web.match('/<int:id>', 'id') | (lambda e, d: None),
+                web.match('/<string(max=1):x>/<y>', 'xy') | \
+                        (lambda e, d: Response('xy')),
+                web.match('/<x>/<y>', 'xy2') | (lambda e, d: Response('xy2')),
+                web.match('/<x>', 'x') | (lambda e, d: Response('x')))
+
+        # conversion fails for the first branch matched by the regexp
+        # and the next matching branch is used
+        self.assertEqual(web.ask(Application(make_app(),
+                                             compile_routes=True),
+                                 '/10/y').body,
+                         b'xy2')
+        CompiledRoutingTests('assertSameRouting').assertSameRouting(
+            make_app, ['/1', '/1/y', '/10/y', '/a', '/a/b', '/a/b/c'])
+
+
+class SubdomainGroupTests(unittest.TestCase):
+
+    def make_app(self):
+        def h(e, d):
+            return Response(u'{} {} {}'.format(
+                    e.current_location, e._route_state.primary_domain,
+                    e._route_state.subdomain))
+        s = web.subdomain
+        return s('example.com') | web.cases(
+            s('') | web.match('/', 'index') | h,
+            s('www', '', primary='') | web.match('/www', 'www') | h,
+            s('a.b', 'b') | web.match('/', 'ab') | h,
+            s('c', 'x.c') | web.match('/', 'c') | h,
+            s('c') | web.match('/c2', 'c2') | h,
+            s('tenant1', 'alias1', name='tenant1') | web.cases(
+                s('api') | web.match('/', 'api') | h,
+                web.match('/', 'index') | h),
+            web.match('/static', 'static') | h,
+            s('tenant2', None) | web.match('/', 'any') | h,
+        )
+
+    def test_find_subdomain_groups(self):
+        s = web.subdomain
+        handlers = [s('a'), s('b') | web.match('/'), web.match('/'),
+                    s('c'), web.prefix('/'), s('d'), s('e')]
+        self.assertEqual(find_subdomain_groups(handlers), [(0, 2), (5, 7)])
+
+    def test_same_routing(self):
+        hosts = ['example.com', 'www.example.com', 'a.b.example.com',
+                 'b.example.com', 'z.b.example.com', 'c.example.com',
+                 'x.c.example.com', 'y.x.c.example.com',
+                 'tenant1.example.com', 'api.alias1.example.com',
+                 'tenant2.example.com', 'other.example.com',
+                 'example.org']
+        for host in hosts:
+            CompiledRoutingTests('assertSameRouting').assertSameRouting(
+                self.make_app, ['/', '/www', '/c2', '/static'],
+                headers={'Host': host})
+
+    def test_group_is_used(self):
+        app = self.make_app()
+        app._compile()
+        nested = app.next_handler
+        self.assertEqual(len(nested._router.subdomain_groups), 6)
+        env = web.AppEnvironment.create(
+                web.Request.blank('/c2', headers={'Host': 'x.c.example.com'}),
+                web.Reverse.from_handler(app))
+        env._route_state = env._route_state.add_subdomain('example.com',
+                                                          'example.com')
+        routed = nested._router.route(env)
+        # only branches matching the domain and the prefix are left,
+        # the first matching alias is used
+        self.assertEqual([x.args for x in routed[:2]],
+                         [('c', None), ('c', None)])
+        # and the branch with `None` alias
+        self.assertEqual(len(routed), 3)
+        self.assertEqual(web.ask(app, '/c2',
+                                 headers={'Host': 'x.c.example.com'}).body,
+                         b'c2 c.example.com x')
+
+
+class AdaptiveCasesTests(unittest.TestCase):
+
+    def make_app(self):
+        def respond(text):
+            return lambda e, d: Response(text)
+        return web.cases(
+            web.match('/', 'index') | respond('index'),
+            web.match('/a', 'a') | respond('a'),
+            web.match('/b', 'b') | web.method('POST') | respond('b-post'),
+            web.match('/c', 'c') | respond('c'),
+            # the same template, it is not reordered
+            web.match('/b', 'b-get') | respond('b-get'),
+            web.match('/<x>', 'x') | respond('x'),
+            adaptive=True)
+
+    def test_find_static_runs(self):
+        self.assertEqual(find_static_runs(self.make_app().handlers), [(0, 4)])
+        self.assertEqual(find_static_runs([
+            web.match('/a'), web.match('/b'), web.match('/a'), web.match('/c'),
+            web.prefix('/d'), web.match('/e')]), [(0, 2), (2, 4)])
+
+    def test_reorder(self):
+        app = self.make_app()
+        stats = app.stats
+        stats.reorder_every = 10
+        for i in range(3):
+            self.assertEqual(web.ask(app, '/c').body, b'c')
+        self.assertEqual(web.ask(app, '/a').body, b'a')
+        self.assertEqual(web.ask(app, '/b').body, b'b-get')
+        self.assertEqual(web.ask(app, '/b', method='POST').body, b'b-post')
+        self.assertEqual(stats.order, [0, 1, 2, 3, 4, 5])
+        for i in range(4):
+            self.assertEqual(web.ask(app, '/x').body, b'x')
+        self.assertEqual(stats.order, [3, 1, 2, 0, 4, 5])
+        self.assertEqual(stats.hits, [0, 1, 1, 3, 1, 4])
+        self.assertEqual(stats.misses[5], 0)
+        # tried for /c, /b and /x requests and returned None
+        self.assertEqual(stats.misses[2], 8)
+        # the routing is the same after reordering
+        self.assertEqual(web.ask(app, '/').body, b'index')
+        self.assertEqual(web.ask(app, '/b').body, b'b-get')
+        self.assertEqual(web.ask(app, '/b', method='POST').body, b'b-post')
+
+    def test_not_adaptive(self):
+        app = web.cases(web.match('/', 'index'))
+        self.assertEqual(app.stats, None)
+        self.assertRaises(TypeError, web.cases, web.match('/'), other=True)
+
+    def test_chain_resets_stats(self):
+        app = self.make_app()
+        web.ask(app, '/a')
+        chained = app | web.request_filter(lambda e, d, nxt: nxt(e, d))
+        self.assertEqual(chained.stats.hits, [0] * 6)
+        self.assertEqual(app.stats.hits[1], 1)
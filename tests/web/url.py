@@ -203,6 +203,23 @@ class URLTests(unittest.TestCase):
         url_deepcopy = copy.deepcopy(url_orig)
         self.assertEqual(str(url_orig), str(url_deepcopy))
 
+    def test_qs_shares_parts(self):
+        url = URL(u'/урл/', host=u'xn--80aswg.xn--p1ai', port='8000',
+                  fragment='a', show_host=False)
+        self.assertEqual(url, '/%D1%83%D1%80%D0%BB/#a')
+        self.assertEqual(url.query, {})
+        url = url.qs_set(a=1).qs_add(b=2).qs_delete('a')
+        self.assertEqual(url, '/%D1%83%D1%80%D0%BB/?b=2#a')
+        self.assertEqual(url.host, u'сайт.рф')
+        self.assertEqual((url.port, url.scheme, url.show_host),
+                         ('8000', 'http', False))
+        self.assertEqual(url.with_host(),
+                         'http://xn--80aswg.xn--p1ai:8000'
+                         '/%D1%83%D1%80%D0%BB/?b=2#a')
+        self.assertEqual(url.with_host().qs_set(b=3),
+                         'http://xn--80aswg.xn--p1ai:8000'
+                         '/%D1%83%D1%80%D0%BB/?b=3#a')
+
 class UrlTemplateTest(unittest.TestCase):
     def test_match(self):
         'Simple match'
@@ -1,8 +1,14 @@
 # -*- coding: utf-8 -*-
-__all__ = ['UrlTemplateTests']
+__all__ = ['UrlTemplateTests', 'ConverterArgsTests']
 
+import pickle
 import unittest
-from iktomi.web.url_templates import UrlTemplate, construct_re
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
+from iktomi.web.url_templates import UrlTemplate, construct_re, \
+        parse_converter_args
 from iktomi.web.url_converters import Converter
 
 class UrlTemplateTests(unittest.TestCase):
@@ -115,3 +121,73 @@ class UrlTemplateTests(unittest.TestCase):
                               converters=convs,
                               anonymous=False)[0]
         self.assertEqual(regexp.pattern, r'^\/simple\/(?P<id>.+)')
+
+    def test_lazy_pattern(self):
+        'UrlTemplate compiles the pattern on first match'
+        ut = UrlTemplate('/simple/<int:id>')
+        self.assertNotIn('_pattern', ut.__dict__)
+        self.assertEqual(ut(id=2), '/simple/2')
+        self.assertNotIn('_pattern', ut.__dict__)
+        self.assertEqual(ut.match('/simple/2'), ('/simple/2', {'id':2}))
+        self.assertIn('_pattern', ut.__dict__)
+
+    def test_regex_not_compiled(self):
+        'Source of the pattern for compiled routing is not compiled'
+        ut = UrlTemplate('/simple/<int:id>')
+        with patch('iktomi.web.url_templates.re.compile') as compile:
+            self.assertEqual(ut._regex(), r'/simple/(?P<id>(?:[1-9]\d*|0))$')
+            self.assertEqual(ut._regex(group_prefix='_b1_'),
+                             r'/simple/(?P<_b1_id>(?:[1-9]\d*|0))$')
+        self.assertFalse(compile.called)
+        self.assertNotIn('_pattern', ut.__dict__)
+
+    def test_pickle(self):
+        'UrlTemplate can be pickled after it was matched'
+        ut = UrlTemplate('/simple/<int:id>')
+        ut.match('/simple/2')
+        ut = pickle.loads(pickle.dumps(ut))
+        self.assertEqual(ut.match('/simple/3'), ('/simple/3', {'id':3}))
+
+
+class ConverterArgsTests(unittest.TestCase):
+
+    def test_parse(self):
+        self.assertEqual(parse_converter_args('a, b,"probably, no",maybe'),
+                         (('a', 'b', 'probably, no', 'maybe'), {}))
+        self.assertEqual(parse_converter_args(u'default=0, max=10'),
+                         ((), {'default': 0, 'max': 10}))
+        self.assertEqual(parse_converter_args('format="%Y.%m.%d"'),
+                         ((), {'format': '%Y.%m.%d'}))
+        self.assertEqual(parse_converter_args(
+                            r""" 'a\'b', u"c", -1, 2.5, True, None, """),
+                         (("a'b", u'c', -1, 2.5, True, None), {}))
+
+    def test_escapes(self):
+        # the same as python string literals
+        for literal in [r"'\d+'", r"'a\\b'", r"'\x41\101\0'",
+                        r"u'\u0439\U0001F600\n'", r"'\q\"'", r"'a\\'",
+                        r"b'\x41\u0439\xff'", r"r'\d\''"]:
+            args = parse_converter_args(literal)
+            self.assertEqual(args, ((eval(literal),), {}), literal)
+
+    def test_regex_argument(self):
+        ut = UrlTemplate(r'/<string(regex="\d+"):x>')
+        self.assertEqual(ut._url_params['x'].regex, r'\d+')
+        self.assertEqual(ut.match('/123'), ('/123', {'x': '123'}))
+        self.assertEqual(ut.match('/ddd'), (None, {}))
+
+    def test_parse_errors(self):
+        self.assertRaises(ValueError, parse_converter_args, 'a b')
+        self.assertRaises(ValueError, parse_converter_args, 'max=1, a')
+        self.assertRaises(ValueError, parse_converter_args, '__import__("os")')
+        self.assertRaises(ValueError, parse_converter_args, r"'\x4'")
+        self.assertRaises(ValueError, parse_converter_args, r"u'\u04'")
+        self.assertRaises(ValueError, lambda: UrlTemplate('/<int(max=):a>'))
+
+    def test_shared_converters(self):
+        t1 = UrlTemplate('/<any(a, b):x>')
+        t2 = UrlTemplate('/<any(a, b):y>/<int:z>')
+        self.assertTrue(t1._url_params['x'] is t2._url_params['y'])
+        self.assertEqual(t2._url_params['y'].values, ('a', 'b'))
+        self.assertEqual(t2.match('/b/1'), ('/b/1', {'y': 'b', 'z': 1}))
+